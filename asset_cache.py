@@ -0,0 +1,182 @@
+import pygame
+import os
+import sys
+import json
+import mmap
+import time
+import hashlib
+import threading
+from typing import Tuple, List, Optional
+
+# Decoded background frames are cached here as raw pixel blobs so later runs
+# (and later levels sharing an asset) can map them instead of running PIL
+CACHE_DIR = os.environ.get("UB_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "untitled-boxing"))
+CACHE_VERSION = 2
+PATH_INDEX = "paths.json"  # absolute path -> content hash, with the mtime and size it was taken at
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_hash(path: str, cache_dir: str = CACHE_DIR) -> str:
+    # Content hash of `path`, remembered in the cache dir's path index so an
+    # unchanged file is only read once; a new mtime or size re-hashes it
+    index_path = os.path.join(cache_dir, PATH_INDEX)
+    key = os.path.abspath(path)
+    stat = os.stat(path)
+    stamp = [stat.st_mtime, stat.st_size]
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+    entry = index.get(key)
+    if entry and entry.get("stamp") == stamp:
+        return entry["hash"]
+    digest = file_hash(path)
+    index[key] = {"stamp": stamp, "hash": digest}
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{index_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, index_path)
+    except OSError:
+        pass
+    return digest
+
+
+def surface_record(surface: pygame.Surface) -> Tuple[str, bytes, Optional[list]]:
+    if surface.get_bytesize() == 1:
+        return "P", pygame.image.tobytes(surface, "P"), [list(c)[:3] for c in surface.get_palette()]
+    return "RGB", pygame.image.tobytes(surface, "RGB"), None
+
+
+class FrameCache:
+    # One entry per (source content, frame size), so the same GIF under two
+    # paths (stages sharing art) is decoded and stored once. The entry is a
+    # raw blob of all frames back to back plus a JSON manifest with offsets,
+    # pixel formats and palettes. An edited source hashes differently and
+    # simply misses; source_hash keeps startup from re-reading the file.
+    def __init__(self, path: str, size: Tuple[int, int], cache_dir: str = CACHE_DIR):
+        self.path = path
+        self.size = tuple(size)
+        self.cache_dir = cache_dir
+        self.hash = source_hash(path, cache_dir)
+        name = hashlib.sha1(f"{self.hash}:{size[0]}x{size[1]}:{CACHE_VERSION}".encode()).hexdigest()
+        self.blob_path = os.path.join(cache_dir, name + ".raw")
+        self.meta_path = os.path.join(cache_dir, name + ".json")
+        # Two paths with the same content share an entry and may fill it at
+        # once, so every writer gets its own temporary file
+        self.tmp_suffix = f".{os.getpid()}-{id(self)}.tmp"
+        self.meta = None
+        self.map = None
+        self.writer = None  # the blob being written, while frames arrive
+        self.written = {}  # index -> offset table entry for frames in the blob
+        self.failed = False
+
+    def open(self) -> bool:
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            if meta["hash"] != self.hash or meta["size"] != list(self.size) or meta["version"] != CACHE_VERSION:
+                return False
+            with open(self.blob_path, "rb") as f:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.meta = meta
+            return True
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def __len__(self):
+        return len(self.meta["frames"]) if self.meta else 0
+
+    def surface(self, index: int) -> pygame.Surface:
+        # The surface shares memory with the mapped file, so only the pages
+        # that actually get blitted are ever read in
+        entry = self.meta["frames"][index]
+        view = memoryview(self.map)[entry["offset"]:entry["offset"] + entry["length"]]
+        surface = pygame.image.frombuffer(view, self.size, entry["mode"])
+        if entry["palette"]:
+            surface.set_palette([tuple(c) for c in entry["palette"]])
+        return surface
+
+    def surfaces(self) -> List[pygame.Surface]:
+        return [self.surface(i) for i in range(len(self))]
+
+    def put(self, index: int, surface: pygame.Surface, frame_count: int):
+        # Frames can arrive out of order (GifStream decodes lazily). Each one
+        # is appended to the blob as it arrives and only its offset is kept;
+        # the manifest is written, and the entry mapped, once all are in.
+        if self.meta is not None or self.failed or index in self.written:
+            return
+        try:
+            if self.writer is None:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                self.writer = open(self.blob_path + self.tmp_suffix, "wb")
+            mode, data, palette = surface_record(surface)
+            self.written[index] = {"offset": self.writer.tell(), "length": len(data), "mode": mode, "palette": palette}
+            self.writer.write(data)
+            if len(self.written) == frame_count:
+                self.finish()
+        except OSError as e:
+            print(f"Could not write asset cache for: {self.path}\n{e}")
+            self.abandon()
+
+    def finish(self):
+        self.writer.close()
+        self.writer = None
+        os.replace(self.blob_path + self.tmp_suffix, self.blob_path)
+        meta = {"hash": self.hash, "size": list(self.size), "version": CACHE_VERSION,
+                "frames": [self.written[i] for i in range(len(self.written))]}
+        self.written = {}
+        self.write_meta(meta)
+        self.open()
+
+    def abandon(self):
+        # Give up on this entry; a later run will try again
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            try:
+                os.remove(self.blob_path + self.tmp_suffix)
+            except OSError:
+                pass
+        self.failed = True
+        self.written = {}
+
+    def write_meta(self, meta: dict):
+        tmp_path = self.meta_path + self.tmp_suffix
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def clear(self):
+        for path in (self.blob_path, self.meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    from background import load_gif_frames, stream_gif_frames
+
+    gif = sys.argv[1] if len(sys.argv) > 1 else "assets/background/underground.gif"
+    size = (1200, 800)
+    FrameCache(gif, size).clear()
+    for label in ("cold", "warm"):
+        start = time.perf_counter()
+        frames = load_gif_frames(gif, size)
+        print(f"load_gif_frames {label}: frames={len(frames)} {(time.perf_counter() - start) * 1000:.1f}ms")
+    for label in ("cold", "warm"):
+        start = time.perf_counter()
+        stream = stream_gif_frames(gif, size)
+        first = time.perf_counter() - start
+        for i in range(len(stream)):
+            stream[i]
+        print(f"stream_gif_frames {label}: first_frame={first * 1000:.1f}ms "
+              f"full_cycle={(time.perf_counter() - start) * 1000:.1f}ms")
@@ -0,0 +1,161 @@
+import os
+import re
+import sys
+import json
+import time
+import pygame
+from typing import Dict, Optional
+
+import display
+
+# Sprites are packed into one atlas image plus a JSON index, so loading them
+# is one image read and one convert_alpha, and every sprite is a subsurface
+# view into the same pixels. `python atlas.py` rebuilds the atlas from
+# assets/sprites/**.png (named by path, e.g. "portraits/den-phantom-lai")
+# plus the generated sprites below; the game builds it in memory if the
+# files are missing.
+SOURCE_DIR = os.path.join("assets", "sprites")
+ATLAS_DIR = os.path.join("assets", "atlas")
+ATLAS_VERSION = 1
+PADDING = 1
+MAX_WIDTH = 1024
+
+YELLOW = (234, 179, 8)
+GRAY = (100, 100, 100)
+
+
+def polygon_sprite(points, color, size=None):
+    # Rasterised once at build time; (ox, oy) is where the sprite's top-left
+    # sits relative to the point the caller would have drawn the polygon at
+    left = min(x for x, _ in points)
+    top = min(y for _, y in points)
+    width = max(x for x, _ in points) - left + 1
+    height = max(y for _, y in points) - top + 1
+    sprite = pygame.Surface(size or (width, height), pygame.SRCALPHA)
+    pygame.draw.polygon(sprite, color, [(x - left, y - top) for x, y in points])
+    return sprite, (left, top)
+
+
+MENU_STAR = [(10, 0), (12, 7), (20, 7), (14, 12), (16, 20), (10, 15), (4, 20), (6, 12), (0, 7), (8, 7)]
+SELECT_STAR = [(10, 0), (14, 14), (24, 14), (16, 22), (18, 34), (10, 26), (2, 34), (4, 22), (-4, 14), (6, 14)]
+
+GENERATED = {
+    # The menu star has always been cut to 20x20, clipping its outer points
+    "stars/menu": lambda: polygon_sprite(MENU_STAR, YELLOW, (20, 20)),
+    "stars/select": lambda: polygon_sprite(SELECT_STAR, YELLOW),
+    "stars/select_empty": lambda: polygon_sprite(SELECT_STAR, GRAY),
+}
+
+
+def slug(name: str) -> str:
+    # 'Den "Phantom" Lai' -> 'den-phantom-lai'
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def collect_sprites(source_dir: str = SOURCE_DIR) -> Dict[str, tuple]:
+    sprites = {name: make() for name, make in GENERATED.items()}
+    for root, _, files in os.walk(source_dir):
+        for filename in sorted(files):
+            if not filename.lower().endswith(".png"):
+                continue
+            path = os.path.join(root, filename)
+            name = os.path.splitext(os.path.relpath(path, source_dir))[0].replace(os.sep, "/")
+            try:
+                sprites[name] = (pygame.image.load(path), (0, 0))
+            except pygame.error as e:
+                print(f"Skipping sprite: {path}\n{e}")
+    return sprites
+
+
+def pack(sizes: Dict[str, tuple], max_width: int = MAX_WIDTH):
+    # Shelf packing, tallest first: fill a row left to right, then start a
+    # new row under it. Good enough for a few hundred mostly similar sprites.
+    width = max([max_width] + [w + 2 * PADDING for w, _ in sizes.values()])
+    x = y = shelf = 0
+    rects = {}
+    for name in sorted(sizes, key=lambda n: (-sizes[n][1], n)):
+        w, h = sizes[name]
+        if x + w + 2 * PADDING > width:
+            x, y, shelf = 0, y + shelf, 0
+        rects[name] = (x + PADDING, y + PADDING, w, h)
+        x += w + 2 * PADDING
+        shelf = max(shelf, h + 2 * PADDING)
+    used = max([x + w + PADDING for x, _, w, _ in rects.values()] + [1])
+    return rects, (used, y + shelf)
+
+
+def build(sprites: Dict[str, tuple]):
+    rects, size = pack({name: surface.get_size() for name, (surface, _) in sprites.items()})
+    image = pygame.Surface(size, pygame.SRCALPHA)
+    image.fill((0, 0, 0, 0))
+    image.blits([(sprites[name][0], rect[:2]) for name, rect in rects.items()], doreturn=False)
+    index = {"version": ATLAS_VERSION,
+             "sprites": {name: list(rect) + list(sprites[name][1]) for name, rect in rects.items()}}
+    return image, index
+
+
+def save(name: str, image: pygame.Surface, index: dict, atlas_dir: str = ATLAS_DIR):
+    os.makedirs(atlas_dir, exist_ok=True)
+    pygame.image.save(image, os.path.join(atlas_dir, name + ".png"))
+    with open(os.path.join(atlas_dir, name + ".json"), "w") as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+
+
+class Atlas:
+    # get() hands out subsurfaces of the one converted image; they share its
+    # pixels, so a batch of them goes through Surface.blits like any other
+    # surfaces. Missing names return None so callers can keep a placeholder
+    # until the art exists.
+    def __init__(self, image: pygame.Surface, index: dict):
+        image = display.convert(image)
+        self.image = image
+        self.views = {}
+        self.offsets = {}
+        for name, (x, y, w, h, ox, oy) in index["sprites"].items():
+            self.views[name] = image.subsurface((x, y, w, h))
+            self.offsets[name] = (ox, oy)
+
+    def __contains__(self, name: str):
+        return name in self.views
+
+    def get(self, name: str) -> Optional[pygame.Surface]:
+        return self.views.get(name)
+
+    def offset(self, name: str):
+        return self.offsets.get(name, (0, 0))
+
+    def row(self, name: str, x: int, y: int, count: int, spacing: int):
+        # Blit sequence for `count` copies side by side, e.g. a star rating
+        sprite = self.views[name]
+        ox, oy = self.offsets[name]
+        return [(sprite, (x + ox + i * spacing, y + oy)) for i in range(count)]
+
+
+atlases: Dict[str, Atlas] = {}
+
+
+def load(name: str = "sprites", atlas_dir: str = ATLAS_DIR) -> Atlas:
+    # Loaded once per name; call after the display is up so the image is
+    # converted to its pixel format
+    atlas = atlases.get(name)
+    if atlas is None:
+        try:
+            with open(os.path.join(atlas_dir, name + ".json")) as f:
+                index = json.load(f)
+            if index["version"] != ATLAS_VERSION:
+                raise ValueError(f"atlas version {index['version']}")
+            image = pygame.image.load(os.path.join(atlas_dir, name + ".png"))
+        except (OSError, ValueError, KeyError, pygame.error) as e:
+            print(f"Could not load atlas {name}, building it instead: {e}")
+            image, index = build(collect_sprites())
+        atlas = atlases[name] = Atlas(image, index)
+    return atlas
+
+
+if __name__ == "__main__":
+    name = sys.argv[1] if len(sys.argv) > 1 else "sprites"
+    start = time.perf_counter()
+    image, index = build(collect_sprites())
+    save(name, image, index)
+    print(f"{name}: {len(index['sprites'])} sprites in {image.get_width()}x{image.get_height()} "
+          f"({(time.perf_counter() - start) * 1000:.1f}ms)")
@@ -0,0 +1,274 @@
+import pygame
+import os
+import sys
+import time
+import resource
+from collections import OrderedDict
+from typing import Tuple, Dict
+from asset_cache import FrameCache
+from preloader import preloader
+import display
+
+# Byte budget for upscaled background frames. They are kept in the display's
+# format (4 bytes a pixel) so drawing one is a plain copy; the default fits
+# an 8-frame loop at 1200x800. 0 scales on every blit instead of caching,
+# which is the cheapest option on memory-constrained machines.
+SCALED_FRAME_BUDGET = int(os.environ.get("UB_SCALED_FRAME_BUDGET", 32 * 1024 * 1024))
+
+
+def peak_rss_kb() -> int:
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+# Function to load and resize GIF frames
+def load_gif_frames(path: str, size: Tuple[int, int]) -> list:
+    frames = []
+    try:
+        cache = FrameCache(path, size)
+        if cache.open():
+            frames = cache.surfaces()
+            display.when_ready(lambda: display.convert_all(frames))
+            return frames
+        from PIL import Image
+        img = Image.open(path)
+        for frame in range(img.n_frames):
+            img.seek(frame)
+            frame_img = img.convert("RGB").resize(size)
+
+            mode = frame_img.mode
+            data = frame_img.tobytes()
+            surface = pygame.image.fromstring(data, frame_img.size, mode)  # use resized size here
+            frames.append(surface)
+            cache.put(frame, surface, img.n_frames)
+        display.when_ready(lambda: display.convert_all(frames))
+    except Exception as e:
+        print(f"Error loading GIF frames from: {path}\n{e}")
+    return frames
+
+
+def surface_bytes(surface: pygame.Surface) -> int:
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+def frame_to_surface(frame) -> pygame.Surface:
+    # Keep frames 8-bit whenever they fit in a palette. Pillow hands back
+    # frames after the first as RGB; those still have at most 256 colours in
+    # practice and median cut maps them exactly when that is the case.
+    if frame.mode != "P" and frame.convert("RGB").getcolors(256) is not None:
+        from PIL import Image
+        frame = frame.convert("RGB").quantize(256, method=Image.Quantize.MEDIANCUT)
+    if frame.mode == "P":
+        surface = pygame.image.fromstring(frame.tobytes(), frame.size, "P")
+        palette = frame.getpalette()
+        surface.set_palette([tuple(palette[i:i + 3]) for i in range(0, len(palette), 3)])
+        return surface
+    frame = frame.convert("RGB")
+    return pygame.image.fromstring(frame.tobytes(), frame.size, "RGB")
+
+
+class BlitScaler:
+    # Scales the native frame every time it is drawn. Nothing is kept.
+    def __init__(self, size: Tuple[int, int]):
+        self.size = size
+
+    def scale(self, key, surface: pygame.Surface) -> pygame.Surface:
+        if surface.get_size() == self.size:
+            return surface
+        return pygame.transform.scale(surface, self.size)
+
+    def resident_bytes(self) -> int:
+        return 0
+
+
+class ScaledFrameCache(BlitScaler):
+    # LRU of upscaled frames, bounded by a byte budget rather than a count so
+    # the same setting works for any window size
+    def __init__(self, size: Tuple[int, int], budget: int = SCALED_FRAME_BUDGET):
+        super().__init__(size)
+        self.budget = budget
+        self.frames: OrderedDict = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def scale(self, key, surface: pygame.Surface) -> pygame.Surface:
+        scaled = self.frames.get(key)
+        if scaled is not None:
+            self.frames.move_to_end(key)
+            self.hits += 1
+            return scaled
+        self.misses += 1
+        scaled = display.convert(super().scale(key, surface))
+        cost = surface_bytes(scaled)
+        if cost > self.budget:
+            return scaled
+        while self.frames and self.bytes + cost > self.budget:
+            _, old = self.frames.popitem(last=False)
+            self.bytes -= surface_bytes(old)
+        self.frames[key] = scaled
+        self.bytes += cost
+        return scaled
+
+    def resident_bytes(self) -> int:
+        return self.bytes
+
+
+def make_scaler(size: Tuple[int, int], budget: int = SCALED_FRAME_BUDGET) -> BlitScaler:
+    return ScaledFrameCache(size, budget) if budget > 0 else BlitScaler(size)
+
+
+class GifStream:
+    # Decodes GIF frames on demand and only keeps the frame being shown plus a
+    # few look-ahead frames, at the GIF's own resolution. Frames are scaled to
+    # `size` on the way out by `scaler`. Behaves like the list returned by
+    # load_gif_frames (len, indexing, truthiness) so Level.draw_background can
+    # use either.
+    def __init__(self, path: str, size: Tuple[int, int], lookahead: int = 2, scaler: BlitScaler = None):
+        start = time.perf_counter()
+        self.path = path
+        self.size = size
+        self.lookahead = max(0, lookahead)
+        self.scaler = scaler or make_scaler(size)
+        # Pillow is only needed once a GIF is actually opened
+        from PIL import Image
+        self.img = Image.open(path)
+        self.cache = FrameCache(path, self.img.size)
+        if self.cache.open():
+            self.frame_count = len(self.cache)
+        else:
+            self.frame_count = getattr(self.img, "n_frames", 1)
+        self.frames: Dict[int, pygame.Surface] = {}
+        self.decoded = 0
+        self.evicted = 0
+        self.decode(0)
+        self.time_to_first_frame = time.perf_counter() - start
+
+    def __len__(self):
+        return self.frame_count
+
+    def __bool__(self):
+        return self.frame_count > 0
+
+    def __getitem__(self, index: int) -> pygame.Surface:
+        index %= self.frame_count
+        surface = self.frames.get(index)
+        if surface is None:
+            surface = self.decode(index)
+        self.evict(index)
+        self.prefetch(index)
+        return self.scaler.scale(index, surface)
+
+    def window(self, index: int) -> list:
+        count = min(self.lookahead + 1, self.frame_count)
+        return [(index + i) % self.frame_count for i in range(count)]
+
+    def decode(self, index: int) -> pygame.Surface:
+        # PIL rewinds internally when seeking backwards, so looping back to
+        # frame 0 is cheap and forward playback never re-decodes old frames
+        if self.cache.meta is not None:
+            surface = self.cache.surface(index)
+        else:
+            self.img.seek(index)
+            surface = frame_to_surface(self.img)
+            self.cache.put(index, surface, self.frame_count)
+        self.frames[index] = surface
+        self.decoded += 1
+        return surface
+
+    def prefetch(self, index: int):
+        # Decode at most one missing look-ahead frame per access so the cost
+        # is spread over the frames between background ticks
+        for ahead in self.window(index)[1:]:
+            if ahead not in self.frames:
+                self.decode(ahead)
+                return
+
+    def evict(self, index: int):
+        keep = set(self.window(index))
+        for old in [i for i in self.frames if i not in keep]:
+            del self.frames[old]
+            self.evicted += 1
+
+    def resident_bytes(self) -> int:
+        return sum(surface_bytes(f) for f in self.frames.values()) + self.scaler.resident_bytes()
+
+    def close(self):
+        self.frames.clear()
+        self.img.close()
+
+
+def stream_gif_frames(path: str, size: Tuple[int, int], lookahead: int = 2, scaler: BlitScaler = None):
+    try:
+        return GifStream(path, size, lookahead, scaler)
+    except Exception as e:
+        print(f"Error loading GIF frames from: {path}\n{e}")
+        return []
+
+
+def preload_gif_frames(report, path: str, size: Tuple[int, int], lookahead: int = 2):
+    # Preloader job: decode every frame once so the disk cache is complete,
+    # then hand back a stream that reads from it. Each frame is on disk as
+    # soon as it's decoded (FrameCache.put), so only the window around it
+    # stays resident, as during playback.
+    try:
+        stream = GifStream(path, size, lookahead)
+        for i in range(len(stream)):
+            if i not in stream.frames:
+                stream.decode(i)
+            stream.evict(i)
+            report(i + 1, len(stream))
+        stream.evict(0)
+        return stream
+    except Exception as e:
+        print(f"Error loading GIF frames from: {path}\n{e}")
+        return []
+
+
+def preload_background(path: str, size: Tuple[int, int]):
+    # Preload handle for a stage's decoded frames, submitted on first call;
+    # the preloader keeps it, so later calls for the same file share the one
+    # decode. None without a background.
+    if not path:
+        return None
+    return preloader.submit(f"bg:{path}", preload_gif_frames, path, size)
+
+
+def forget_background(path: str):
+    # Drops the preloader's reference so the stream can be freed once
+    # nothing else holds it; the next preload_background decodes again
+    if path:
+        preloader.forget(f"bg:{path}")
+
+
+def report(mode: str, path: str, size: Tuple[int, int], lookahead: int = 2):
+    # Run one mode per process: ru_maxrss is a high-water mark, so measuring
+    # both loaders in the same interpreter would hide the difference
+    rss_before = peak_rss_kb()
+    start = time.perf_counter()
+    if mode == "eager":
+        frames = load_gif_frames(path, size)
+        first_frame = time.perf_counter() - start
+    else:
+        budget = 0 if mode == "blit" else SCALED_FRAME_BUDGET
+        frames = stream_gif_frames(path, size, lookahead, make_scaler(size, budget))
+        first_frame = frames.time_to_first_frame if frames else 0.0
+    for i in range(len(frames) * 2):
+        frames[i % len(frames)]
+    total = time.perf_counter() - start
+    resident = sum(surface_bytes(f) for f in frames) if mode == "eager" else frames.resident_bytes()
+    print(f"{mode}: frames={len(frames)} time_to_first_frame={first_frame * 1000:.1f}ms "
+          f"full_cycle={total * 1000:.1f}ms resident={resident // 1024}KB "
+          f"peak_rss={peak_rss_kb()}KB (+{peak_rss_kb() - rss_before}KB)")
+
+
+if __name__ == "__main__":
+    import subprocess
+
+    gif = sys.argv[1] if len(sys.argv) > 1 else "assets/background/underground.gif"
+    if len(sys.argv) > 2:
+        report(sys.argv[2], gif, (1200, 800))
+    else:
+        for mode in ("eager", "stream", "blit"):
+            subprocess.run([sys.executable, __file__, gif, mode], check=True)
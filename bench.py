@@ -0,0 +1,343 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+# Every benchmark runs in its own interpreter with SDL's dummy drivers, so
+# peak RSS, caches and the display mode of one case can't leak into the next
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+BASELINE_PATH = "bench_baseline.json"
+REGRESSION_THRESHOLD = 0.10  # fractional slowdown of a median before it's flagged
+FIGHT_BACKGROUND = "assets/background/underground.gif"
+
+
+def sample(fn, warmup, repeat):
+    # fn() does one repetition and returns {metric: value}
+    for _ in range(warmup):
+        fn()
+    samples = {}
+    for _ in range(repeat):
+        for name, value in fn().items():
+            samples.setdefault(name, []).append(value)
+    return samples
+
+
+def bench_gif_load(warmup, repeat):
+    import pygame
+    from asset_cache import FrameCache
+    from background import load_gif_frames, peak_rss_kb
+    size = (1200, 800)
+    pygame.init()
+    rss_before = peak_rss_kb()
+
+    def once():
+        FrameCache(FIGHT_BACKGROUND, size).clear()
+        start = time.perf_counter()
+        load_gif_frames(FIGHT_BACKGROUND, size)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        load_gif_frames(FIGHT_BACKGROUND, size)
+        warm = time.perf_counter() - start
+        return {"cold_ms": cold * 1000, "warm_ms": warm * 1000}
+
+    samples = sample(once, warmup, repeat)
+    samples["peak_rss_delta_kb"] = [peak_rss_kb() - rss_before]
+    return samples
+
+
+def bench_level(warmup, repeat, frames=600):
+    import levels
+    from background import load_gif_frames
+    from headless import aggressive_policy, random_policy, find_character
+    levels.init_display(headless=True)
+    bg_frames = load_gif_frames(FIGHT_BACKGROUND, (levels.WINDOW_WIDTH, levels.WINDOW_HEIGHT))
+    player = find_character("CPU")
+    opponent = find_character("SHADOW VIPER")
+    renderer = levels.renderer
+
+    def once():
+        level = levels.Level(player, opponent, bg_frames=bg_frames)
+        # Long enough round that it ends on the clock after `frames` ticks
+        level.round_time = level.current_time = frames / level.sim_hz
+        level.render_hz = level.sim_hz
+        level.rng = random.Random(0)
+        level.opponent_policy = random_policy
+        presented = renderer.frames
+        start = time.perf_counter()
+        level.run(script=aggressive_policy, realtime=False)
+        elapsed = time.perf_counter() - start
+        return {"fps": (renderer.frames - presented) / elapsed}
+
+    return sample(once, warmup, repeat)
+
+
+def bench_background(warmup, repeat, frames=600):
+    # Per-frame cost of drawing the fight background, both as fully decoded
+    # frames and as the stream the game actually plays from
+    import levels
+    from background import load_gif_frames, stream_gif_frames
+    screen = levels.init_display(headless=True)
+    size = (levels.WINDOW_WIDTH, levels.WINDOW_HEIGHT)
+    loaded = {"eager": load_gif_frames(FIGHT_BACKGROUND, size),
+              "stream": stream_gif_frames(FIGHT_BACKGROUND, size)}
+
+    def once():
+        result = {}
+        for name, bg_frames in loaded.items():
+            start = time.perf_counter()
+            for i in range(frames):
+                screen.blit(bg_frames[i // 10 % len(bg_frames)], (0, 0))
+            result[f"{name}_blit_us"] = (time.perf_counter() - start) / frames * 1e6
+        return result
+
+    return sample(once, warmup, repeat)
+
+
+def bench_menu(warmup, repeat, frames=600):
+    import main
+    main.init_display(headless=True)
+    renderer = main.renderer
+
+    def once():
+        renderer.reset()
+        start = time.perf_counter()
+        for i in range(frames):
+            # Move the selection now and then like a player browsing
+            main.selected_item = (i // 60) % len(main.menu_items)
+            main.track_menu()
+            renderer.draw(main.draw_menu)
+            renderer.present()
+            main.animation_counter += 1
+        return {"fps": frames / (time.perf_counter() - start)}
+
+    return sample(once, warmup, repeat)
+
+
+def bench_character_card(warmup, repeat, frames=600):
+    import pygame
+    import main
+    main.init_display(headless=True)
+
+    def once():
+        start = time.perf_counter()
+        for i in range(frames):
+            main.draw_character_card((i // 30) % len(main.characters))
+            pygame.display.flip()
+        return {"fps": frames / (time.perf_counter() - start)}
+
+    return sample(once, warmup, repeat)
+
+
+def bench_text(warmup, repeat, calls=20000):
+    import pygame
+    from text_cache import text_cache, get_sysfont
+    pygame.init()
+    font = get_sysfont("Arial", 24)
+    texts = [f"{n:02d}" for n in range(100)] + ["You win! Press ENTER to continue...", "START FIGHT", "OPTIONS"]
+
+    def once():
+        start = time.perf_counter()
+        for i in range(calls):
+            font.render(texts[i % len(texts)], True, (255, 255, 255))
+        raw = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(calls):
+            text_cache.render(font, texts[i % len(texts)], (255, 255, 255))
+        cached = time.perf_counter() - start
+        return {"render_us": raw / calls * 1e6, "cached_us": cached / calls * 1e6}
+
+    return sample(once, warmup, repeat)
+
+
+def bench_simulation(warmup, repeat, matches=20):
+    from headless import simulate_match, find_character, aggressive_policy, random_policy
+    player = find_character("CPU")
+    opponent = find_character("SHADOW VIPER")
+
+    def once():
+        ticks = 0
+        start = time.perf_counter()
+        for seed in range(matches):
+            ticks += simulate_match(player, opponent, aggressive_policy, random_policy, seed=seed, round_time=60)["ticks"]
+        return {"ticks_per_s": ticks / (time.perf_counter() - start)}
+
+    return sample(once, warmup, repeat)
+
+
+def bench_rollback(warmup, repeat):
+    # Rolling back and resimulating the whole window has to fit in a frame
+    from rollback import bench_resim, MAX_ROLLBACK
+
+    def once():
+        median, worst = bench_resim(MAX_ROLLBACK, 50)
+        return {"resim_ms": median, "resim_worst_ms": worst}
+
+    return sample(once, warmup, repeat)
+
+
+def bench_collision(warmup, repeat, frames=50):
+    # Broad and narrow phase for a crowded multi-fighter arena
+    import numpy as np
+    from collision import bench as collision_bench
+
+    def once():
+        timings, _ = collision_bench(5000, 64, frames, np.random.default_rng(0), brute=False)
+        return {"query_ms": timings["auto"] * 1000}
+
+    return sample(once, warmup, repeat)
+
+
+def bench_startup(warmup, repeat):
+    # Cold start of the real game up to its first menu frame
+    env = dict(os.environ, UB_STARTUP_REPORT="json")
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+    def once():
+        proc = subprocess.run([sys.executable, main_py], env=env, capture_output=True, text=True,
+                              cwd=os.path.dirname(main_py), timeout=60)
+        phases = json.loads(proc.stdout.strip().splitlines()[-1])
+        return {f"{name}_ms": ms for name, ms in phases.items()}
+
+    return sample(once, warmup, repeat)
+
+
+BENCHMARKS = {
+    "startup": bench_startup,
+    "gif_load": bench_gif_load,
+    "background": bench_background,
+    "level_run": bench_level,
+    "menu": bench_menu,
+    "character_card": bench_character_card,
+    "text": bench_text,
+    "simulation": bench_simulation,
+    "rollback": bench_rollback,
+    "collision": bench_collision,
+}
+
+# Metrics where a bigger number is better; everything else is a cost
+HIGHER_IS_BETTER = ("fps", "ticks_per_s")
+
+
+def summarize(samples):
+    return {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "max": max(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "samples": samples,
+    }
+
+
+def run_one(name, warmup, repeat):
+    samples = BENCHMARKS[name](warmup, repeat)
+    return {metric: summarize(values) for metric, values in samples.items()}
+
+
+def run_all(names, warmup, repeat):
+    # Returns (results, names of the cases that crashed)
+    results = {}
+    failed = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # A private asset cache keeps the cold GIF numbers cold
+        env = dict(os.environ, UB_CACHE_DIR=cache_dir)
+        for name in names:
+            proc = subprocess.run([sys.executable, __file__, "--run-one", name, "--warmup", str(warmup),
+                                   "--repeat", str(repeat)], env=env, capture_output=True, text=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__)))
+            if proc.returncode != 0:
+                print(f"{name}: failed\n{proc.stderr}")
+                failed.append(name)
+                continue
+            results[name] = json.loads(proc.stdout.strip().splitlines()[-1])
+    return results, failed
+
+
+def compare(results, baseline, threshold):
+    # Returns (benchmark, metric, baseline, current, change) for every metric
+    # whose median got worse by more than `threshold`
+    regressions = []
+    for name, metrics in results.items():
+        for metric, summary in metrics.items():
+            old = baseline.get("results", {}).get(name, {}).get(metric)
+            if not old or not old["median"]:
+                continue
+            change = summary["median"] / old["median"] - 1
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            if worse > threshold:
+                regressions.append((name, metric, old["median"], summary["median"], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless rendering and simulation benchmarks")
+    parser.add_argument("benchmarks", nargs="*", help=f"any of {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="compare against this results file")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark: {name}")
+
+    if args.run_one:
+        print(json.dumps(run_one(args.run_one, args.warmup, args.repeat)))
+        return 0
+
+    measured, failed = run_all(args.benchmarks or list(BENCHMARKS), args.warmup, args.repeat)
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "warmup": args.warmup,
+            "repeat": args.repeat,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": measured,
+        "failed": failed,
+    }
+    for name, metrics in results["results"].items():
+        for metric, summary in metrics.items():
+            print(f"{name:<16} {metric:<18} median {summary['median']:12.2f}  "
+                  f"min {summary['min']:12.2f}  max {summary['max']:12.2f}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 1 if failed else 0
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        baseline = None
+    regressions = compare(results["results"], baseline, args.threshold) if baseline else []
+    for name, metric, old, new, change in regressions:
+        print(f"REGRESSION {name}.{metric}: {old:.2f} -> {new:.2f} ({change:+.1%})")
+    # A crashed case has no numbers to compare, so it must not pass as clean
+    for name in failed:
+        print(f"FAILED {name}")
+    if baseline and not regressions and not failed:
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 1 if regressions or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import os
+import json
+from typing import Dict, List, Optional, Tuple
+
+import atlas
+
+# Characters, opponents and stages live in assets/catalog.json (or
+# UB_CATALOG). Records only hold what the menus and the simulation read
+# straight away; portraits and backgrounds are looked up the first time
+# something draws them, so a big roster costs a JSON parse at startup and
+# nothing more.
+CATALOG_PATH = os.environ.get("UB_CATALOG", os.path.join("assets", "catalog.json"))
+CATALOG_VERSION = 1
+
+UNLOADED = object()
+
+
+def rating(value) -> Optional[Tuple[str, int]]:
+    # Moves are stored as [move name, stars]
+    return (value[0], int(value[1])) if value else None
+
+
+class Character:
+    __slots__ = ("id", "name", "color", "backstory", "passive", "special", "portrait_name", "loaded_portrait")
+
+    def __init__(self, id: str, name: str, color, backstory: str = "", passive=None, special=None, portrait=None):
+        self.id = id
+        self.name = name
+        self.color = tuple(color)
+        self.backstory = backstory
+        self.passive = rating(passive)
+        self.special = rating(special)
+        self.portrait_name = portrait or f"portraits/{id}"
+        self.loaded_portrait = UNLOADED
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data.get("id") or atlas.slug(data["name"]), data["name"], data["color"], data.get("backstory", ""),
+                   data.get("passive"), data.get("special"), data.get("portrait"))
+
+    @property
+    def portrait(self):
+        # An atlas view once there's art for this character, else None
+        if self.loaded_portrait is UNLOADED:
+            self.loaded_portrait = atlas.load().get(self.portrait_name)
+        return self.loaded_portrait
+
+    def __repr__(self):
+        return f"Character({self.id!r})"
+
+
+class Stage:
+    __slots__ = ("id", "name", "opponent", "background_path", "round_time", "intro")
+
+    def __init__(self, id: str, name: str, opponent: Character, background=None, round_time=None, intro=()):
+        self.id = id
+        self.name = name
+        self.opponent = opponent
+        self.background_path = background
+        self.round_time = round_time
+        self.intro = list(intro)
+
+    def __repr__(self):
+        return f"Stage({self.id!r})"
+
+
+class Catalog:
+    def __init__(self, data: dict):
+        if data.get("version", CATALOG_VERSION) != CATALOG_VERSION:
+            raise ValueError(f"catalog version {data['version']}")
+        self.characters: List[Character] = [Character.from_dict(c) for c in data.get("characters", [])]
+        self.opponents: List[Character] = [Character.from_dict(c) for c in data.get("opponents", [])]
+        # Ids and display names both resolve; ids win if a name collides
+        self.index: Dict[str, Character] = {}
+        for record in self.characters + self.opponents:
+            self.index.setdefault(record.name, record)
+        for record in self.characters + self.opponents:
+            self.index[record.id] = record
+        self.levels: List[Stage] = [
+            Stage(s["id"], s.get("name", s["id"]), self.find(s["opponent"]), s.get("background"),
+                  s.get("round_time"), s.get("intro", ()))
+            for s in data.get("levels", [])]
+        self.stages: Dict[str, Stage] = {stage.id: stage for stage in self.levels}
+
+    def find(self, key: str) -> Character:
+        # By id or by name; KeyError for neither
+        return self.index[key]
+
+    def stage(self, id: str) -> Stage:
+        return self.stages[id]
+
+    def roster(self) -> List[Character]:
+        return self.characters + self.opponents
+
+
+catalogs: Dict[str, Catalog] = {}
+
+
+def load(path: str = CATALOG_PATH) -> Catalog:
+    catalog = catalogs.get(path)
+    if catalog is None:
+        with open(path, encoding="utf-8") as f:
+            catalog = catalogs[path] = Catalog(json.load(f))
+    return catalog
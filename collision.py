@@ -0,0 +1,313 @@
+import os
+import sys
+import time
+import struct
+import pygame
+import numpy as np
+
+# Hitboxes and hurtboxes. Every step each fighter contributes its hurtboxes
+# (where it can be hit) and every live projectile its hitbox (what can hit);
+# overlapping pairs from different owners land. Fighters stand far apart, so
+# attacks travel: a punch or special spawns a projectile that flies at the
+# opponent and is resolved on impact, when blocking is checked.
+#
+# Boxes are integer (x, y, w, h) rows, overlapping exactly when the
+# equivalent pygame.Rects collide. A few boxes are simply tested against
+# each other (Rect.collidelistall, or one NumPy broadcast); past BRUTE_PAIRS
+# a uniform grid takes over: hurtboxes are filed under the CELL_SIZE cells
+# they cover, each hitbox looks up one cell, and only those candidates are
+# compared, in one batch of NumPy comparisons, so cost follows the number of
+# boxes and near pairs rather than hitboxes x hurtboxes.
+CELL_SIZE = 128
+MAX_CELLS = 1 << 16
+SMALL_PAIRS = 64  # up to this many pairs, one Rect.collidelistall per hitbox
+BRUTE_PAIRS = 16384  # up to this many, every pair in one NumPy comparison
+PROJECTILE_CAPACITY = 512
+
+# Projectile kinds, also the index into the sprites passed to draw()
+PUNCH = 0
+SPECIAL = 1
+
+# Rollback state: the count, then position, velocity, size, damage (health,
+# aura), owner and kind of each projectile
+PROJECTILE_COUNT = struct.Struct("<H")
+PROJECTILE_STATE = struct.Struct("<4d2H2dhB")
+
+
+def cell_keys(boxes: np.ndarray, cell_size: int, rows: int):
+    # Every (cell, box index) pair for the cells each box covers, with
+    # cells numbered column by column from the grid's origin at (0, 0)
+    x0 = boxes[:, 0] // cell_size
+    y0 = boxes[:, 1] // cell_size
+    nx = (boxes[:, 0] + boxes[:, 2] - 1) // cell_size - x0 + 1
+    ny = (boxes[:, 1] + boxes[:, 3] - 1) // cell_size - y0 + 1
+    counts = nx * ny
+    box = np.repeat(np.arange(len(boxes)), counts)
+    k = np.arange(len(box)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return (x0[box] + k % nx[box]) * rows + y0[box] + k // nx[box], box
+
+
+def overlapping(hits, hit_owner, hurts, hurt_owner, cell_size: int = CELL_SIZE):
+    # (hit indices, hurt indices) of every overlapping pair with different
+    # owners, ordered by hit then hurt. Boxes are (n, 4) arrays or lists of
+    # (x, y, w, h); owners are arrays or lists of ints.
+    pairs = len(hits) * len(hurts)
+    if not pairs:
+        return [], []
+    if pairs <= SMALL_PAIRS:
+        return overlapping_rects(hits, hit_owner, hurts, hurt_owner)
+    hits = np.asarray(hits, np.int32).reshape(-1, 4)
+    hurts = np.asarray(hurts, np.int32).reshape(-1, 4)
+    hit_owner, hurt_owner = np.asarray(hit_owner), np.asarray(hurt_owner)
+    if pairs <= BRUTE_PAIRS:
+        return overlapping_brute(hits, hit_owner, hurts, hurt_owner)
+    return overlapping_grid(hits, hit_owner, hurts, hurt_owner, cell_size)
+
+
+def overlapping_rects(hits, hit_owner, hurts, hurt_owner):
+    rects = [pygame.Rect(box) for box in hurts]
+    a, b = [], []
+    for i, (box, owner) in enumerate(zip(hits, hit_owner)):
+        for j in pygame.Rect(box).collidelistall(rects):
+            if hurt_owner[j] != owner:
+                a.append(i)
+                b.append(j)
+    return a, b
+
+
+def overlapping_brute(hits, hit_owner, hurts, hurt_owner):
+    # Every hitbox against every hurtbox in one broadcast comparison
+    h, t = hits[:, None, :], hurts[None, :, :]
+    keep = ((h[..., 0] < t[..., 0] + t[..., 2]) & (t[..., 0] < h[..., 0] + h[..., 2])
+            & (h[..., 1] < t[..., 1] + t[..., 3]) & (t[..., 1] < h[..., 1] + h[..., 3])
+            & (hit_owner[:, None] != hurt_owner[None, :]))
+    a, b = np.nonzero(keep)
+    return a.tolist(), b.tolist()
+
+
+def overlapping_grid(hits, hit_owner, hurts, hurt_owner, cell_size=CELL_SIZE):
+    # Broad phase. Hurtboxes are grown by the largest hitbox, up and to the
+    # left, and filed under every grid cell they then cover; a hitbox can
+    # only overlap the hurtboxes filed under the cell of its top-left
+    # corner, so each one is a single lookup and no pair turns up twice.
+    # The grid spans the grown hurtboxes, coarsening if that's too many cells.
+    grown = hurts.astype(np.int64)
+    grown[:, 0] -= int(hits[:, 2].max()) - 1
+    grown[:, 1] -= int(hits[:, 3].max()) - 1
+    grown[:, 2] += hurts[:, 0] - grown[:, 0]
+    grown[:, 3] += hurts[:, 1] - grown[:, 1]
+    left, top = int(grown[:, 0].min()), int(grown[:, 1].min())
+    grown[:, 0] -= left
+    grown[:, 1] -= top
+    width = int((grown[:, 0] + grown[:, 2]).max())
+    height = int((grown[:, 1] + grown[:, 3]).max())
+    while (width // cell_size + 1) * (height // cell_size + 1) > MAX_CELLS:
+        cell_size *= 2
+    cols, rows = (width - 1) // cell_size + 1, (height - 1) // cell_size + 1
+    cells, hurt_box = cell_keys(grown, cell_size, rows)
+    hurt_box = hurt_box[np.argsort(cells, kind="stable")]
+    filed = np.bincount(cells, minlength=cols * rows)
+    first = np.cumsum(filed) - filed
+
+    hx = (hits[:, 0].astype(np.int64) - left) // cell_size
+    hy = (hits[:, 1].astype(np.int64) - top) // cell_size
+    inside = (hx >= 0) & (hx < cols) & (hy >= 0) & (hy < rows)
+    cell = np.where(inside, hx * rows + hy, 0)
+    counts = np.where(inside, filed[cell], 0)
+    a = np.repeat(np.arange(len(hits)), counts)
+    b = hurt_box[np.arange(len(a)) + np.repeat(first[cell] - (np.cumsum(counts) - counts), counts)]
+
+    # Narrow phase, all candidate pairs at once
+    h, t = hits[a], hurts[b]
+    keep = ((h[:, 0] < t[:, 0] + t[:, 2]) & (t[:, 0] < h[:, 0] + h[:, 2])
+            & (h[:, 1] < t[:, 1] + t[:, 3]) & (t[:, 1] < h[:, 1] + h[:, 3])
+            & (hit_owner[a] != hurt_owner[b]))
+    return a[keep].tolist(), b[keep].tolist()
+
+
+class Projectile:
+    __slots__ = ("x", "y", "vx", "vy", "w", "h", "damage", "aura_damage", "owner", "kind")
+
+    def __init__(self, x, y, vx, vy, w, h, damage, aura_damage, owner, kind):
+        self.x = x
+        self.y = y
+        self.vx = vx
+        self.vy = vy
+        self.w = w
+        self.h = h
+        self.damage = damage
+        self.aura_damage = aura_damage
+        self.owner = owner
+        self.kind = kind
+
+    def box(self):
+        return int(self.x), int(self.y), self.w, self.h
+
+
+class ProjectilePool:
+    # Projectiles in flight, in spawn order, so the same inputs always
+    # resolve in the same order. At most `capacity`; spawns past it are
+    # dropped.
+    def __init__(self, capacity=PROJECTILE_CAPACITY):
+        self.capacity = capacity
+        self.items = []
+        self.dropped = 0
+
+    @property
+    def count(self):
+        return len(self.items)
+
+    def spawn(self, owner, kind, x, y, w, h, vx, vy, damage, aura_damage=0.0):
+        if len(self.items) >= self.capacity:
+            self.dropped += 1
+            return None
+        projectile = Projectile(float(x), float(y), float(vx), float(vy), w, h, float(damage), float(aura_damage),
+                                owner, kind)
+        self.items.append(projectile)
+        return projectile
+
+    def update(self, dt, bounds):
+        # Moves every projectile and drops the ones that left `bounds`
+        left, top, width, height = bounds
+        right, bottom = left + width, top + height
+        kept = []
+        for p in self.items:
+            p.x += p.vx * dt
+            p.y += p.vy * dt
+            if p.x + p.w > left and p.x < right and p.y + p.h > top and p.y < bottom:
+                kept.append(p)
+        self.items = kept
+
+    def incoming(self, box, owner, reach):
+        # Whether a projectile someone else threw is heading into `box` and
+        # will reach it within `reach` pixels
+        x, y, w, h = box
+        for p in self.items:
+            if p.owner == owner or p.y >= y + h or p.y + p.h <= y:
+                continue
+            ahead = x - (p.x + p.w) if p.vx > 0 else p.x - (x + w)
+            if ahead < reach:
+                return True
+        return False
+
+    def snapshot(self) -> bytes:
+        return PROJECTILE_COUNT.pack(len(self.items)) + b"".join(
+            PROJECTILE_STATE.pack(p.x, p.y, p.vx, p.vy, p.w, p.h, p.damage, p.aura_damage, p.owner, p.kind)
+            for p in self.items)
+
+    def restore(self, data, offset=0):
+        n, = PROJECTILE_COUNT.unpack_from(data, offset)
+        offset += PROJECTILE_COUNT.size
+        self.items = [Projectile(*PROJECTILE_STATE.unpack_from(data, offset + i * PROJECTILE_STATE.size))
+                      for i in range(n)]
+
+    def bounds(self):
+        if not self.items:
+            return pygame.Rect(0, 0, 0, 0)
+        return pygame.Rect(self.items[0].box()).unionall([p.box() for p in self.items])
+
+    def draw(self, surface, sprites):
+        # One Surface.blits call; sprites[kind] is centred on each hitbox
+        blits = []
+        for p in self.items:
+            sprite = sprites[p.kind]
+            x, y = int(p.x), int(p.y)
+            blits.append((sprite, (x + (p.w - sprite.get_width()) // 2, y + (p.h - sprite.get_height()) // 2)))
+        surface.blits(blits, doreturn=False)
+
+    def clear(self):
+        self.items = []
+
+
+class CollisionWorld:
+    # The projectiles in flight plus the fighters they can hit. step() moves
+    # them, tests their hitboxes against this step's hurtboxes and applies
+    # what lands: a hitbox lands once, on the first hurtbox it overlaps, and
+    # damage goes through Fighter.take_hit (blocking, passive stars) with the
+    # aura part drained directly. Each fighter's slot is its index here, the
+    # owner id its projectiles and hurtboxes carry.
+    def __init__(self, fighters: list, bounds, capacity=PROJECTILE_CAPACITY):
+        self.fighters = fighters
+        for i, fighter in enumerate(fighters):
+            fighter.slot = i
+        self.bounds = pygame.Rect(bounds)
+        self.projectiles = ProjectilePool(capacity)
+
+    def hurtboxes(self):
+        boxes, owners = [], []
+        for fighter in self.fighters:
+            for box in fighter.hurtboxes():
+                boxes.append(box)
+                owners.append(fighter.slot)
+        return boxes, owners
+
+    def step(self, dt):
+        # Returns [(fighter, kind)] for every hit, in a fixed order
+        pool = self.projectiles
+        pool.update(dt, self.bounds)
+        if not pool.items:
+            return []
+        items = pool.items
+        hurts, hurt_owner = self.hurtboxes()
+        a, b = overlapping([p.box() for p in items], [p.owner for p in items], hurts, hurt_owner)
+        if not a:
+            return []
+        hits = []
+        landed = set()
+        for i, j in zip(a, b):
+            if i in landed:
+                continue
+            landed.add(i)
+            p = items[i]
+            fighter = self.fighters[hurt_owner[j]]
+            fighter.take_hit(p.damage)
+            fighter.aura = max(0, fighter.aura - p.aura_damage)
+            hits.append((fighter, p.kind))
+        pool.items = [p for i, p in enumerate(items) if i not in landed]
+        return hits
+
+    def incoming(self, fighter, reach):
+        return any(self.projectiles.incoming(box, fighter.slot, reach) for box in fighter.hurtboxes())
+
+
+def bench(hit_count, fighter_count, frames, rng, brute=True):
+    # Fighters spread along an arena that grows with them, projectiles
+    # scattered across it; returns seconds per query for each method
+    width, height = 600 * fighter_count, 800
+    hurts = np.empty((fighter_count, 4), np.int32)
+    hurts[:, 0] = np.arange(fighter_count) * 600 + rng.integers(0, 500, fighter_count)
+    hurts[:, 1] = rng.integers(0, height - 200, fighter_count)
+    hurts[:, 2:] = 100, 200
+    hurt_owner = np.arange(fighter_count, dtype=np.int16)
+    hits = np.empty((hit_count, 4), np.int32)
+    hits[:, 0] = rng.integers(0, width, hit_count)
+    hits[:, 1] = rng.integers(0, height, hit_count)
+    hits[:, 2:] = 24
+    hit_owner = rng.integers(0, fighter_count, hit_count).astype(np.int16)
+    methods = [("auto", overlapping), ("grid", overlapping_grid)]
+    if brute:
+        methods.append(("brute", overlapping_brute))
+    timings, results = {}, {}
+    for name, fn in methods:
+        start = time.perf_counter()
+        for _ in range(frames):
+            results[name] = fn(hits, hit_owner, hurts, hurt_owner)
+        timings[name] = (time.perf_counter() - start) / frames
+        assert results[name] == results["auto"]
+    return timings, len(results["auto"][0])
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    rng = np.random.default_rng(0)
+    fighter_counts = [int(n) for n in sys.argv[1:]] or [2, 16, 256]
+    for fighters in fighter_counts:
+        for hits in (4, 100, 1000, 10000, 50000):
+            frames = 200 if hits <= 1000 else 20
+            brute = hits * fighters <= 5_000_000
+            timings, landed = bench(hits, fighters, frames, rng, brute)
+            brute_ms = f"{timings['brute'] * 1000:8.3f}ms" if brute else "   skipped"
+            line = (f"{fighters:>4} fighters {hits:>6} hitboxes: {timings['auto'] * 1000:8.3f}ms  "
+                    f"(grid {timings['grid'] * 1000:8.3f}ms  brute {brute_ms})")
+            print(f"{line}  ({landed} hits)")
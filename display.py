@@ -0,0 +1,87 @@
+import os
+import pygame
+from typing import Tuple
+
+# The one window the game runs in. The menu (800x600) and the fight
+# (1200x800) both go through use(), which starts the video and font
+# subsystems the first time and afterwards only switches the mode. Audio
+# waits for the first sound or track (init_audio, called by sound_bank.py).
+# pygame keeps the same display Surface object across set_mode calls, so
+# modules holding on to `screen` stay valid.
+screen = None
+clock = None
+headless = False
+audio = None  # None until the first init_audio(), then whether it worked
+pending = []  # when_ready() callbacks waiting for the first set_mode
+
+
+def init(headless_: bool = False) -> pygame.Surface:
+    global clock, headless
+    if clock is not None:
+        return screen
+    if headless_:
+        # Must be set before SDL's video/audio subsystems start
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+    headless = headless_
+    # Only what the first frame needs; pygame.init() would also open the
+    # audio device, which is the slowest part of startup on real hardware
+    pygame.display.init()
+    pygame.font.init()
+    clock = pygame.time.Clock()
+    return screen
+
+
+def init_audio() -> bool:
+    global audio
+    if audio is None:
+        try:
+            pygame.mixer.init()
+            audio = True
+        except pygame.error as e:
+            print(f"Audio unavailable: {e}")
+            audio = False
+    return audio
+
+
+def use(size: Tuple[int, int], caption: str, headless_: bool = False) -> pygame.Surface:
+    global screen
+    init(headless_)
+    if screen is None or screen.get_size() != tuple(size):
+        screen = pygame.display.set_mode(size)
+    pygame.display.set_caption(caption)
+    while pending:
+        pending.pop(0)()
+    return screen
+
+
+def ready() -> bool:
+    return pygame.display.get_surface() is not None
+
+
+def convert(surface: pygame.Surface, colorkey=None, rle: bool = False) -> pygame.Surface:
+    # Copies a loaded or generated surface into the display's pixel format so
+    # every later blit is a straight copy rather than a per-pixel conversion.
+    # Per-pixel alpha is kept (convert_alpha); colorkey sprites can ask for
+    # RLE, which skips their transparent runs when blitting. Before the
+    # display exists the surface comes back as it is; see when_ready().
+    if ready():
+        surface = surface.convert_alpha() if surface.get_flags() & pygame.SRCALPHA else surface.convert()
+    if colorkey is not None:
+        surface.set_colorkey(colorkey, pygame.RLEACCEL if rle else 0)
+    return surface
+
+
+def convert_all(surfaces: list):
+    # In place, so holders of the list see the converted frames
+    surfaces[:] = [convert(surface) for surface in surfaces]
+
+
+def when_ready(fn):
+    # Runs fn now if the display is up, else right after it first is. For
+    # assets made at import time that need converting once there's a format.
+    if ready():
+        fn()
+    else:
+        pending.append(fn)
+
@@ -0,0 +1,290 @@
+import time
+import numpy as np
+
+from catalog import Character
+from collision import CollisionWorld, PUNCH, SPECIAL
+from levels import (Fighter, Level, ORBIT_RADIUS, AURA_SPEED, AURA_REGEN, ATTACK_COOLDOWN, BLOCK_REDUCTION,
+                    PASSIVE_REDUCTION, PUNCH_DAMAGE, SPECIAL_DAMAGE, SPECIAL_STAR_DAMAGE, SPECIAL_COST,
+                    PUNCH_SIZE, PUNCH_SPEED, SPECIAL_SIZE, SPECIAL_SPEED, SPECIAL_AURA_DRAIN,
+                    DEFAULT_STARS, SIM_HZ, WINDOW_WIDTH, WINDOW_HEIGHT,
+                    INPUT_BLOCK, INPUT_CHARGE, INPUT_PUNCH, INPUT_SPECIAL)
+
+ORBIT_ANGLES = np.radians(np.arange(0, 360, 30, dtype=np.float64))
+INPUT_CHOICES = np.array([0, INPUT_BLOCK, INPUT_CHARGE, INPUT_PUNCH, INPUT_SPECIAL], dtype=np.uint8)
+PROJECTILES_PER_FIGHTER = 4  # a throw crosses the arena in 1.2s at most, one every ATTACK_COOLDOWN
+ARENA = (0, 0, WINDOW_WIDTH, WINDOW_HEIGHT)
+START_X = (200, 900)  # Level's player and opponent
+START_Y = 400
+
+
+class ProjectileStore:
+    # Struct-of-arrays collision.ProjectilePool for a FighterStore. Rows
+    # 0..count-1 are in flight, in spawn order. Every match in a store has
+    # its own arena, so each projectile carries the fighter it was thrown at
+    # and can only hit that one (in a two-fighter Level that is the only
+    # hurtbox it doesn't own anyway). Projectiles only fly horizontally.
+    __slots__ = ("capacity", "count", "dropped", "x", "y", "vx", "size", "damage", "aura_damage",
+                 "owner", "target", "kind")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.count = 0
+        self.dropped = 0
+        self.x = np.zeros(capacity, np.float64)
+        self.y = np.zeros(capacity, np.float64)
+        self.vx = np.zeros(capacity, np.float64)
+        self.size = np.zeros(capacity, np.int32)
+        self.damage = np.zeros(capacity, np.float64)
+        self.aura_damage = np.zeros(capacity, np.float64)
+        self.owner = np.zeros(capacity, np.int64)
+        self.target = np.zeros(capacity, np.int64)
+        self.kind = np.zeros(capacity, np.uint8)
+
+    def arrays(self):
+        return (self.x, self.y, self.vx, self.size, self.damage, self.aura_damage, self.owner, self.target, self.kind)
+
+    def spawn(self, owner, target, kind, x, y, size, vx, damage, aura_damage):
+        # Spawns past capacity are dropped, like ProjectilePool.spawn
+        n = min(len(owner), self.capacity - self.count)
+        self.dropped += len(owner) - n
+        rows = slice(self.count, self.count + n)
+        for array, values in zip(self.arrays(), (x, y, vx, size, damage, aura_damage, owner, target, kind)):
+            array[rows] = values[:n]
+        self.count += n
+
+    def update(self, dt, bounds):
+        # Moves every projectile and drops the ones that left `bounds`
+        left, top, width, height = bounds
+        n = self.count
+        x, y, size = self.x[:n], self.y[:n], self.size[:n]
+        x += self.vx[:n] * dt
+        self.keep((x + size > left) & (x < left + width) & (y + size > top) & (y < top + height))
+
+    def keep(self, mask):
+        rows = np.flatnonzero(mask)
+        for array in self.arrays():
+            array[:len(rows)] = array[rows]
+        self.count = len(rows)
+
+
+class FighterStore:
+    # Struct-of-arrays version of levels.Fighter for crowds, tag teams and
+    # batches of simultaneous headless matches. Fighter i is row i of every
+    # array. The rules mirror Fighter.update / take_hit and
+    # Level.resolve_attack / resolve_hits, just applied to every fighter at
+    # once: attacks are thrown as projectiles that land (or get blocked)
+    # when they reach the defender's hurtbox, as in collision.CollisionWorld.
+    __slots__ = ("capacity", "count", "x", "y", "health", "aura", "aura_timer", "prev_aura_timer",
+                 "cooldown", "inputs", "passive", "special", "rounds_won", "projectiles")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.count = 0
+        self.x = np.zeros(capacity, np.float64)
+        self.y = np.zeros(capacity, np.float64)
+        self.health = np.full(capacity, 100, np.int16)
+        self.aura = np.full(capacity, 100.0, np.float64)
+        self.aura_timer = np.zeros(capacity, np.float64)
+        self.prev_aura_timer = np.zeros(capacity, np.float64)
+        self.cooldown = np.zeros(capacity, np.float64)
+        self.inputs = np.zeros(capacity, np.uint8)
+        self.passive = np.full(capacity, DEFAULT_STARS, np.uint8)
+        self.special = np.full(capacity, DEFAULT_STARS, np.uint8)
+        self.rounds_won = np.zeros(capacity, np.uint8)
+        self.projectiles = ProjectileStore(capacity * PROJECTILES_PER_FIGHTER)
+
+    def add(self, position, passive=DEFAULT_STARS, special=DEFAULT_STARS):
+        if self.count == self.capacity:
+            raise IndexError("FighterStore is full")
+        i = self.count
+        self.x[i], self.y[i] = position
+        self.passive[i] = passive
+        self.special[i] = special
+        self.count += 1
+        return i
+
+    def add_many(self, n, position=(0, 0), passive=DEFAULT_STARS, special=DEFAULT_STARS):
+        start = self.count
+        if start + n > self.capacity:
+            raise IndexError("FighterStore is full")
+        self.x[start:start + n], self.y[start:start + n] = position
+        self.passive[start:start + n] = passive
+        self.special[start:start + n] = special
+        self.count += n
+        return np.arange(start, start + n)
+
+    def blocking(self):
+        return (self.inputs[:self.count] & INPUT_BLOCK) != 0
+
+    def charging(self):
+        return (self.inputs[:self.count] & INPUT_CHARGE) != 0
+
+    def apply_inputs(self, flags, indices=None):
+        if indices is None:
+            self.inputs[:self.count] = flags
+        else:
+            self.inputs[indices] = flags
+
+    def update(self, dt):
+        n = self.count
+        charging = self.charging()
+        self.prev_aura_timer[:n] = self.aura_timer[:n]
+        self.aura_timer[:n] = np.where(charging, (self.aura_timer[:n] + AURA_SPEED * dt) % 360, self.aura_timer[:n])
+        self.aura[:n] = np.where(charging, np.minimum(100, self.aura[:n] + AURA_REGEN * dt), self.aura[:n])
+        np.maximum(self.cooldown[:n] - dt, 0.0, out=self.cooldown[:n])
+
+    def take_hits(self, targets, damage):
+        damage = np.asarray(damage, np.float64)
+        blocking = (self.inputs[targets] & INPUT_BLOCK) != 0
+        damage = np.where(blocking, damage * (1 - BLOCK_REDUCTION), damage)
+        damage = damage * (1 - PASSIVE_REDUCTION * self.passive[targets])
+        loss = np.maximum(1, np.round(damage)).astype(np.int16)
+        # subtract.at so a fighter hit by several attackers takes every hit
+        np.subtract.at(self.health, targets, loss)
+        np.maximum(self.health[:self.count], 0, out=self.health[:self.count])
+
+    def resolve_attacks(self, attackers, defenders, active=None):
+        inputs = self.inputs[attackers]
+        attack = inputs & (INPUT_PUNCH | INPUT_SPECIAL)
+        ready = (attack != 0) & (self.cooldown[attackers] <= 0) & ((inputs & (INPUT_BLOCK | INPUT_CHARGE)) == 0)
+        if active is not None:
+            ready &= active
+        special = ready & ((attack & INPUT_SPECIAL) != 0) & (self.aura[attackers] >= SPECIAL_COST)
+        punch = ready & ~special & ((attack & INPUT_PUNCH) != 0)
+        thrown = special | punch
+        self.aura[attackers[special]] -= SPECIAL_COST
+        damage = np.where(special, SPECIAL_DAMAGE + SPECIAL_STAR_DAMAGE * self.special[attackers].astype(np.float64),
+                          PUNCH_DAMAGE)
+        # Level.launch: from the attacker's chest, on the side facing the defender
+        size = np.where(special, SPECIAL_SIZE, PUNCH_SIZE)
+        speed = np.where(special, SPECIAL_SPEED, PUNCH_SPEED)
+        x = self.x[attackers]
+        facing_right = self.x[defenders] >= x
+        self.projectiles.spawn(attackers[thrown], defenders[thrown],
+                               np.where(special, SPECIAL, PUNCH)[thrown],
+                               np.where(facing_right, x + 100, x - size)[thrown],
+                               (self.y[attackers] + 60 - size // 2)[thrown], size[thrown],
+                               np.where(facing_right, speed, -speed)[thrown].astype(np.float64), damage[thrown],
+                               np.where(special, SPECIAL_AURA_DRAIN, 0.0)[thrown])
+        self.cooldown[attackers[thrown]] = ATTACK_COOLDOWN
+
+    def resolve_hits(self, dt, bounds=ARENA, active=None):
+        # Moves the projectiles and applies the ones that reached their
+        # target's hurtbox this step, in spawn order. active, per fighter,
+        # leaves projectiles aimed at finished matches where they are.
+        pool = self.projectiles
+        pool.update(dt, bounds)
+        n = pool.count
+        if not n:
+            return
+        target = pool.target[:n]
+        x, y = pool.x[:n].astype(np.int64), pool.y[:n].astype(np.int64)  # int() like Projectile.box
+        size = pool.size[:n]
+        hx, hy = self.x[target], self.y[target]
+        landed = (x < hx + 100) & (hx < x + size) & (y < hy + 200) & (hy < y + size)
+        if active is not None:
+            landed &= active[target]
+        rows = np.flatnonzero(landed)
+        if len(rows):
+            self.take_hits(target[rows], pool.damage[rows])
+            np.subtract.at(self.aura, target[rows], pool.aura_damage[rows])
+            np.maximum(self.aura[:self.count], 0, out=self.aura[:self.count])
+            pool.keep(~landed)
+
+    def orbit_points(self, alpha=1.0, indices=None):
+        # (n, 12, 2) orb centres for every charging fighter in one go
+        if indices is None:
+            indices = np.flatnonzero(self.charging())
+        delta = (self.aura_timer[indices] - self.prev_aura_timer[indices]) % 360
+        angle = np.radians((self.prev_aura_timer[indices] + delta * alpha) % 360)[:, None] + ORBIT_ANGLES
+        points = np.empty((len(indices), len(ORBIT_ANGLES), 2), np.int32)
+        points[..., 0] = self.x[indices, None] + 50 + ORBIT_RADIUS * np.cos(angle)
+        points[..., 1] = self.y[indices, None] + 100 + ORBIT_RADIUS * np.sin(angle)
+        return points
+
+
+def simulate_batch(matches, round_time=60, seed=0, sim_hz=SIM_HZ):
+    # `matches` simultaneous random-vs-random rounds in one store: fighter 2k
+    # fights 2k+1 from Level's starting positions. Step for step the same as
+    # Level.update given the same inputs. Returns per-match final health and
+    # end tick.
+    store = FighterStore(matches * 2)
+    store.add_many(matches * 2, (0, START_Y))
+    player = np.arange(0, matches * 2, 2)
+    opponent = player + 1
+    store.x[player], store.x[opponent] = START_X
+    rng = np.random.default_rng(seed)
+    dt = 1.0 / sim_hz
+    time_left = round_time
+    active = np.ones(matches, bool)
+    end_tick = np.zeros(matches, np.int32)
+    tick = 0
+    while active.any() and time_left > 0:
+        store.apply_inputs(rng.choice(INPUT_CHOICES, matches * 2))
+        time_left -= dt
+        store.update(dt)
+        if time_left > 0:
+            # Level.update stops resolving once its clock runs out
+            store.resolve_hits(dt, ARENA, np.repeat(active, 2))
+            store.resolve_attacks(player, opponent, active)
+            store.resolve_attacks(opponent, player, active)
+        tick += 1
+        done = active & ((store.health[player] <= 0) | (store.health[opponent] <= 0) | (time_left <= 0))
+        end_tick[done] = tick
+        active &= ~done
+    end_tick[active] = tick
+    return store.health[player].copy(), store.health[opponent].copy(), end_tick
+
+
+def bench_objects(n, ticks, dt):
+    fighters = [Fighter("F", (0, 0, 0), (0, 0)) for _ in range(n)]
+    rng = np.random.default_rng(0)
+    level = Level(Character("f", "F", (0, 0, 0)), Character("g", "G", (0, 0, 0)))
+    level.fighters = fighters
+    level.collision = CollisionWorld(fighters, (0, 0, 1200, 800))
+    start = time.perf_counter()
+    for _ in range(ticks):
+        for f, flags in zip(fighters, rng.choice(INPUT_CHOICES, n).tolist()):
+            f.apply_input(flags)
+        for f in fighters:
+            f.update(dt)
+        level.resolve_hits(dt)
+        for i in range(0, n - 1, 2):
+            level.resolve_attack(fighters[i], fighters[i + 1])
+            level.resolve_attack(fighters[i + 1], fighters[i])
+        for f in fighters:
+            if f.aura_charging:
+                f.orbit_points()
+    return (time.perf_counter() - start) / ticks
+
+
+def bench_store(n, ticks, dt):
+    store = FighterStore(n)
+    store.add_many(n)
+    a = np.arange(0, n - 1, 2)
+    b = a + 1
+    rng = np.random.default_rng(0)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        store.apply_inputs(rng.choice(INPUT_CHOICES, n))
+        store.update(dt)
+        store.resolve_hits(dt)
+        store.resolve_attacks(a, b)
+        store.resolve_attacks(b, a)
+        store.orbit_points()
+    return (time.perf_counter() - start) / ticks
+
+
+if __name__ == "__main__":
+    dt = 1.0 / SIM_HZ
+    for n in (2, 100, 10000):
+        ticks = 2000 if n < 10000 else 50
+        obj = bench_objects(n, ticks, dt)
+        soa = bench_store(n, ticks, dt)
+        print(f"{n:>6} fighters: objects {obj * 1e6:9.1f}us/tick  store {soa * 1e6:9.1f}us/tick  "
+              f"({obj / soa:.1f}x)")
+    start = time.perf_counter()
+    player_health, opponent_health, end_tick = simulate_batch(1000)
+    elapsed = time.perf_counter() - start
+    print(f"1000 simultaneous matches: {end_tick.sum()} match-ticks in {elapsed:.2f}s "
+          f"({end_tick.sum() / elapsed:.0f} ticks/s)")
@@ -1,5 +1,6 @@
 # game_state.py
 MENU = "menu"
 CHARACTER_SELECT = "character_select"
+OPTIONS = "options"
 GAMEPLAY = "gameplay"
 EXIT = "exit"
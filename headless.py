@@ -0,0 +1,168 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+# Nothing here needs a window, but make sure anything that does ask for one
+# (Level.run, fonts) gets SDL's dummy drivers instead of a real display
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import levels
+from levels import Level, idle_policy, INPUT_BLOCK, INPUT_CHARGE, INPUT_PUNCH, INPUT_SPECIAL, SPECIAL_COST
+from inputs import InputRecorder, InputReplay
+import catalog
+
+BLOCK_REACH = 200  # px; about 8 ticks of a punch in flight
+
+# Policies are called once per simulation tick as policy(level, me, other, rng)
+# and return input flags. They are plain module-level callables so they can
+# be pickled into worker processes.
+
+
+def random_policy(level, me, other, rng):
+    return rng.choice((0, INPUT_BLOCK, INPUT_CHARGE, INPUT_PUNCH, INPUT_SPECIAL))
+
+
+def aggressive_policy(level, me, other, rng):
+    if me.aura >= SPECIAL_COST:
+        return INPUT_SPECIAL
+    return INPUT_PUNCH
+
+
+def defensive_policy(level, me, other, rng):
+    # Blocks are checked when an attack lands, so hold one while it's close
+    if level.collision.incoming(me, BLOCK_REACH):
+        return INPUT_BLOCK
+    if me.aura < SPECIAL_COST:
+        return INPUT_CHARGE
+    return INPUT_SPECIAL if rng.random() < 0.5 else INPUT_PUNCH
+
+
+class ScriptedInput:
+    # Plays back a fixed list of per-tick input flags, then holds `tail`
+    def __init__(self, inputs, tail=0):
+        self.inputs = list(inputs)
+        self.tail = tail
+
+    def __call__(self, level, me, other, rng):
+        return self.inputs[level.ticks] if level.ticks < len(self.inputs) else self.tail
+
+
+POLICIES = {
+    "idle": idle_policy,
+    "random": random_policy,
+    "aggressive": aggressive_policy,
+    "defensive": defensive_policy,
+}
+
+def roster():
+    return catalog.load().roster()
+
+
+def find_character(name):
+    # By catalog id or display name
+    return catalog.load().find(name)
+
+
+def simulate_match(player, opponent, policy_a, policy_b, seed=0, round_time=None, sim_hz=levels.SIM_HZ, max_ticks=None,
+                   record=None):
+    # Runs one round as fast as the CPU allows, with no display and no clock.
+    # record=<path> saves both fighters' inputs for replay_match.
+    level = Level(player, opponent)
+    if round_time is not None:
+        level.round_time = level.current_time = round_time
+    level.sim_hz = sim_hz
+    level.rng = random.Random(seed)
+    if record:
+        level.recorder = InputRecorder(level, seed)
+    dt = 1.0 / sim_hz
+    while not level.is_over() and (max_ticks is None or level.ticks < max_ticks):
+        input_a = policy_a(level, level.player, level.opponent, level.rng)
+        input_b = policy_b(level, level.opponent, level.player, level.rng)
+        level.step(input_a, input_b, dt)
+    if record:
+        level.recorder.save(record)
+    return match_result(level, seed)
+
+
+def match_result(level, seed):
+    winner = level.winner()
+    return {
+        "player": level.player.name,
+        "opponent": level.opponent.name,
+        "seed": seed,
+        "winner": winner.name if winner else None,
+        "ticks": level.ticks,
+        "player_health": level.player.health,
+        "opponent_health": level.opponent.health,
+        "time_left": max(0.0, level.current_time),
+    }
+
+
+def run_scripted(level, script, opponent_policy=idle_policy):
+    # Exercises Level.run itself (events, rendering, round end) off-screen
+    levels.init_display(headless=True)
+    level.opponent_policy = opponent_policy
+    return level.run(script=script, realtime=False)
+
+
+def replay_match(path, render=False):
+    # Plays a recording back at uncapped speed, headless or through Level.run
+    # (render=True) for profiling. Same inputs, same result, every time.
+    replay = InputReplay(path)
+    player, opponent = replay.fighters
+    level = Level(player, opponent)
+    level.round_time = level.current_time = replay.round_time
+    level.sim_hz = replay.sim_hz
+    if render:
+        run_scripted(level, replay.player, replay.opponent)
+    else:
+        dt = 1.0 / replay.sim_hz
+        while not level.is_over():
+            level.step(replay.player(level, level.player, level.opponent, level.rng),
+                       replay.opponent(level, level.opponent, level.player, level.rng), dt)
+    return match_result(level, replay.seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run headless matches and report results")
+    parser.add_argument("--player", default=catalog.load().characters[0].id, help="catalog id or name")
+    parser.add_argument("--opponent", default=catalog.load().opponents[0].id, help="catalog id or name")
+    parser.add_argument("--policy-a", choices=POLICIES, default="aggressive")
+    parser.add_argument("--policy-b", choices=POLICIES, default="random")
+    parser.add_argument("--matches", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--round-time", type=float, default=60)
+    parser.add_argument("--record", help="save the first match's inputs to this file")
+    parser.add_argument("--replay", help="replay a recorded match instead of simulating")
+    parser.add_argument("--render", action="store_true", help="draw the replay off-screen through Level.run")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        start = time.perf_counter()
+        result = replay_match(args.replay, args.render)
+        elapsed = time.perf_counter() - start
+        print(f"{result['winner'] or 'draw'} after {result['ticks']} ticks "
+              f"({result['player_health']} - {result['opponent_health']}) in {elapsed:.3f}s")
+        return
+
+    player = find_character(args.player)
+    opponent = find_character(args.opponent)
+    wins = {}
+    ticks = 0
+    start = time.perf_counter()
+    for i in range(args.matches):
+        result = simulate_match(player, opponent, POLICIES[args.policy_a], POLICIES[args.policy_b],
+                                seed=args.seed + i, round_time=args.round_time, record=args.record if i == 0 else None)
+        wins[result["winner"]] = wins.get(result["winner"], 0) + 1
+        ticks += result["ticks"]
+    elapsed = time.perf_counter() - start
+    for name, count in sorted(wins.items(), key=lambda item: -item[1]):
+        print(f"{name or 'draw'}: {count}")
+    print(f"{args.matches} matches, {ticks} ticks in {elapsed:.2f}s ({ticks / elapsed:.0f} ticks/s)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import pygame
+from typing import List
+
+import display
+
+RED = (255, 0, 0)
+BLUE = (0, 81, 255)
+YELLOW = (255, 204, 0)
+GREEN = (0, 255, 0)
+WHITE = (255, 255, 255)
+COLORKEY = (255, 0, 255)
+
+# Panel geometry, relative to the top-left of a fighter's bars
+HEALTH_HEIGHT = 30
+AURA_TOP = 40
+AURA_HEIGHT = 20
+WINS_CENTER = 80
+WIN_RADIUS = 10
+WIN_SPACING = 30
+MARGIN = WIN_RADIUS  # round-win dots overhang the bars by their radius
+PANEL_HEIGHT = WINS_CENTER + WIN_RADIUS
+
+
+def panel_layout(count: int, screen_width: int):
+    # Two fighters get the classic 400px bars in opposite corners; more are
+    # spread across the top. Panels on the right half fill towards the
+    # centre, like the opponent's always has.
+    if count == 2:
+        return [(50, False), (screen_width - 450, True)], 400
+    gap = 20
+    width = (screen_width - 100 - gap * (count - 1)) // count
+    return [(50 + i * (width + gap), i >= count / 2) for i in range(count)], width
+
+
+def bar_pair(width: int, height: int, border: int, back, fill):
+    # The same bar empty and full, borders included. Any fill level is the
+    # full one up to the fill width and the empty one after it.
+    pair = []
+    for color in (back, fill):
+        bar = pygame.Surface((width, height))
+        bar.fill(color)
+        pygame.draw.rect(bar, WHITE, bar.get_rect(), border)
+        pair.append(display.convert(bar))
+    return pair
+
+
+class HudPanel:
+    # One fighter's health bar, aura bar and round-win dots. Each part is a
+    # cached surface composited from pre-rendered pieces, and only when its
+    # value moves: the bars are opaque, so re-filling one is two plain
+    # blits, and the dots, which need a colorkey, only change between
+    # rounds, so they can use a RLE-accelerated one.
+    __slots__ = ("fighter", "x", "y", "width", "mirrored", "rect", "bars", "health", "aura", "wins", "state")
+
+    def __init__(self, fighter, x: int, y: int, width: int, mirrored: bool):
+        self.fighter = fighter
+        self.x = x
+        self.y = y
+        self.width = width
+        self.mirrored = mirrored
+        self.rect = pygame.Rect(x - MARGIN, y, width + 2 * MARGIN, PANEL_HEIGHT)
+        self.bars = self.health = self.aura = self.wins = None
+        self.state = (None, None, None)
+
+    def build(self):
+        self.bars = (bar_pair(self.width, HEALTH_HEIGHT, 3, RED, GREEN),
+                     bar_pair(self.width, AURA_HEIGHT, 2, BLUE, YELLOW))
+        self.health = self.bars[0][0].copy()
+        self.aura = self.bars[1][0].copy()
+        self.wins = display.convert(pygame.Surface((self.rect.width, 2 * WIN_RADIUS)), COLORKEY, rle=True)
+
+    def value_state(self):
+        fighter = self.fighter
+        return fighter.health, int(fighter.aura * self.width / 100), fighter.rounds_won
+
+    @staticmethod
+    def fill_bar(bar: pygame.Surface, pair, filled: int):
+        empty, full = pair
+        bar.blit(empty, (0, 0))
+        bar.blit(full, (0, 0), (0, 0, filled, bar.get_height()))
+
+    def sync(self) -> bool:
+        state = self.value_state()
+        if state == self.state:
+            return False
+        if self.bars is None:
+            self.build()
+        health, aura, wins = state
+        if health != self.state[0]:
+            self.fill_bar(self.health, self.bars[0], health * self.width // 100)
+        if aura != self.state[1]:
+            self.fill_bar(self.aura, self.bars[1], aura)
+        if wins != self.state[2]:
+            self.wins.fill(COLORKEY)
+            for i in range(wins):
+                cx = MARGIN + self.width - i * WIN_SPACING if self.mirrored else MARGIN + i * WIN_SPACING
+                pygame.draw.circle(self.wins, YELLOW, (cx, WIN_RADIUS), WIN_RADIUS)
+        self.state = state
+        return True
+
+    def blits(self):
+        return [(self.health, (self.x, self.y)),
+                (self.aura, (self.x, self.y + AURA_TOP)),
+                (self.wins, (self.rect.x, self.y + WINS_CENTER - WIN_RADIUS))]
+
+    def health_rect(self):
+        return (self.x, self.y, self.width, HEALTH_HEIGHT)
+
+    def aura_rect(self):
+        return (self.x, self.y + AURA_TOP, self.width, AURA_HEIGHT)
+
+    def wins_rect(self):
+        count = max(1, self.fighter.rounds_won)
+        width = WIN_SPACING * count
+        left = self.rect.right - width if self.mirrored else self.rect.x
+        return (left, self.y + WINS_CENTER - WIN_RADIUS, width, 2 * WIN_RADIUS)
+
+
+class Hud:
+    # A frame costs one Surface.blits call of cached surfaces however many
+    # fighters there are; draw calls only happen when a value changes.
+    def __init__(self, fighters: list, screen_width: int, top: int = 50):
+        positions, width = panel_layout(len(fighters), screen_width)
+        self.panels: List[HudPanel] = [HudPanel(fighter, x, top, width, mirrored)
+                                       for fighter, (x, mirrored) in zip(fighters, positions)]
+        self.sequence = None
+
+    def sync(self) -> bool:
+        changed = False
+        for panel in self.panels:
+            changed |= panel.sync()
+        if self.sequence is None:
+            self.sequence = [item for panel in self.panels for item in panel.blits()]
+        return changed
+
+    def draw(self, surface: pygame.Surface):
+        surface.blits(self.sequence, doreturn=False)
+
+    def track(self, renderer):
+        # Health, aura and wins are separate dirty regions so a charging
+        # aura doesn't repaint the health bar above it
+        for i, panel in enumerate(self.panels):
+            health, aura, wins = panel.state
+            renderer.track(f"hud{i}_health", panel.health_rect(), health)
+            renderer.track(f"hud{i}_aura", panel.aura_rect(), aura)
+            renderer.track(f"hud{i}_wins", panel.wins_rect(), wins)
@@ -0,0 +1,172 @@
+import os
+import time
+import struct
+import pygame
+from typing import Callable, Dict, List
+
+from profiler import profiler
+from catalog import Character
+from atlas import slug
+
+# Fighter inputs, one bit per held action. Keyboard, scripts, AI policies
+# and replays all produce these.
+INPUT_BLOCK = 1
+INPUT_CHARGE = 2
+INPUT_PUNCH = 4
+INPUT_SPECIAL = 8
+
+KEY_BINDINGS = {
+    pygame.K_SPACE: INPUT_BLOCK,
+    pygame.K_LSHIFT: INPUT_CHARGE,
+    pygame.K_z: INPUT_PUNCH,
+    pygame.K_x: INPUT_SPECIAL,
+}
+
+# Static screens wake at least this often even with no input, so the
+# window stays responsive to the OS and the profiler overlay keeps ticking
+IDLE_TIMEOUT_MS = 250
+
+# UB_RECORD_DIR=<dir> saves every fight's inputs there for replay
+RECORD_DIR = os.environ.get("UB_RECORD_DIR")
+
+# Replay file: header, both fighters, then run-length encoded ticks. Each
+# tick is one byte (player flags in the low nibble, opponent in the high),
+# stored as (byte, repeat count) pairs, so a held block costs 3 bytes
+# however long it's held.
+REPLAY_MAGIC = b"UBRP"
+REPLAY_VERSION = 3  # bumped when the fight rules change too: a replay is only inputs
+REPLAY_HEADER = struct.Struct("<4sBHId")  # magic, version, sim_hz, seed, round_time (a double, like Level.current_time)
+REPLAY_FIGHTER = struct.Struct("<3BBB")  # color, passive stars, special stars
+REPLAY_RUN = struct.Struct("<BH")
+MAX_RUN = 0xFFFF
+
+
+class InputPipeline:
+    # The one place pygame events are read. poll() drains the queue once per
+    # frame, hands every event to the listeners (profiler keys, expose
+    # events for the dirty-rect renderer) and folds key state into `held`,
+    # the fighter input bitmask the simulation samples each tick. `pressed`
+    # lists the keys that went down during the last poll.
+    def __init__(self, bindings: Dict[int, int] = KEY_BINDINGS):
+        self.bindings = bindings
+        self.listeners: List[Callable] = []
+        self.held = 0
+        self.pressed: List[int] = []
+        self.quit = False
+
+    def add_listener(self, fn: Callable):
+        self.listeners.append(fn)
+
+    def reset(self):
+        # Entering a fight: keys held on the previous screen don't count
+        self.held = 0
+        self.pressed = []
+
+    def poll(self, *handlers: Callable, block: bool = False, timeout: int = IDLE_TIMEOUT_MS) -> list:
+        # block=True sleeps in SDL until an event arrives (or `timeout` ms
+        # pass) instead of spinning, for screens with nothing to animate
+        if block:
+            first = pygame.event.wait(timeout)
+            events = pygame.event.get()
+            if first.type != pygame.NOEVENT:
+                events.insert(0, first)
+        else:
+            events = pygame.event.get()
+        self.pressed = []
+        for event in events:
+            for fn in self.listeners:
+                fn(event)
+            for fn in handlers:
+                fn(event)
+            if event.type == pygame.QUIT:
+                self.quit = True
+            elif event.type == pygame.KEYDOWN:
+                self.pressed.append(event.key)
+                self.held |= self.bindings.get(event.key, 0)
+            elif event.type == pygame.KEYUP:
+                self.held &= ~self.bindings.get(event.key, 0)
+        return events
+
+    def wait_for_key(self, keys, *handlers: Callable):
+        # Blocks until one of `keys` is pressed; None if the window closes
+        while True:
+            self.poll(*handlers, block=True)
+            if self.quit:
+                return None
+            for key in self.pressed:
+                if key in keys:
+                    return key
+
+
+class InputRecorder:
+    # Attach as Level.recorder; Level.step feeds it both fighters' inputs
+    def __init__(self, level, seed: int = 0):
+        self.sim_hz = level.sim_hz
+        self.round_time = level.round_time
+        self.seed = seed
+        self.fighters = [level.player, level.opponent]
+        self.runs = []
+        self.ticks = 0
+
+    def record(self, player_input: int, opponent_input: int):
+        packed = (player_input & 0x0F) | (opponent_input & 0x0F) << 4
+        if self.runs and self.runs[-1][0] == packed and self.runs[-1][1] < MAX_RUN:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([packed, 1])
+        self.ticks += 1
+
+    def to_bytes(self) -> bytes:
+        parts = [REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.sim_hz, self.seed, self.round_time)]
+        for fighter in self.fighters:
+            name = fighter.name.encode("utf-8")[:255]
+            parts.append(bytes([len(name)]) + name)
+            parts.append(REPLAY_FIGHTER.pack(*fighter.color, fighter.passive, fighter.special))
+        parts.append(struct.pack("<II", self.ticks, len(self.runs)))
+        parts.extend(REPLAY_RUN.pack(value, count) for value, count in self.runs)
+        return b"".join(parts)
+
+    def save(self, path: str = None) -> str:
+        if path is None or os.path.isdir(path):
+            directory = path or RECORD_DIR or "."
+            names = "-".join(f.name.split()[0].strip('"').lower() for f in self.fighters)
+            path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{names}.ubr")
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+        return path
+
+
+class InputReplay:
+    # Loads a recording back into one byte per tick. player/opponent are
+    # policies (see headless.py) that return what was pressed on level.ticks,
+    # then nothing once the recording runs out.
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, self.sim_hz, self.seed, self.round_time = REPLAY_HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{path} is not a version {REPLAY_VERSION} replay")
+        offset = REPLAY_HEADER.size
+        self.fighters = []
+        for _ in range(2):
+            length = data[offset]
+            name = data[offset + 1:offset + 1 + length].decode("utf-8")
+            offset += 1 + length
+            r, g, b, passive, special = REPLAY_FIGHTER.unpack_from(data, offset)
+            offset += REPLAY_FIGHTER.size
+            self.fighters.append(Character(slug(name), name, (r, g, b), passive=("", passive), special=("", special)))
+        self.ticks, run_count = struct.unpack_from("<II", data, offset)
+        offset += 8
+        self.inputs = bytearray()
+        for value, count in REPLAY_RUN.iter_unpack(data[offset:offset + run_count * REPLAY_RUN.size]):
+            self.inputs += bytes([value]) * count
+
+    def player(self, level, me, other, rng) -> int:
+        return self.inputs[level.ticks] & 0x0F if level.ticks < len(self.inputs) else 0
+
+    def opponent(self, level, me, other, rng) -> int:
+        return self.inputs[level.ticks] >> 4 if level.ticks < len(self.inputs) else 0
+
+
+pipeline = InputPipeline()
+pipeline.add_listener(profiler.handle_event)
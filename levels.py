@@ -1,17 +1,68 @@
 import pygame
 import sys
-from pygame import mixer
-from typing import Tuple, Dict
+import random
 import math
-from PIL import Image
-
-pygame.init()
-mixer.init()
+import time
+import struct
+from background import stream_gif_frames, preload_background, forget_background
+from preloader import wait_with_loading_bar
+from render import DirtyRenderer
+from text_cache import text_cache
+from timestep import FixedTimestep
+import display
+import atlas
+import catalog
+from inputs import pipeline, InputRecorder, RECORD_DIR, INPUT_BLOCK, INPUT_CHARGE, INPUT_PUNCH, INPUT_SPECIAL
+from sound_bank import sound_bank
+from profiler import profiler
+from particles import ParticlePool, circle_sprite
+from hud import Hud
+from collision import CollisionWorld, PUNCH, SPECIAL
+from quality import governor, AURA_ORBS
+import numpy as np
 
 # Constants
 WINDOW_WIDTH = 1200
 WINDOW_HEIGHT = 800
 FPS = 60
+CAPTION = "Ultimate Boxing Championship II"
+FIGHT_FONT = "assets/PressStart2P-Regular.ttf"
+FIGHT_MUSIC = "assets/music/fight_theme.mp3"
+# Fight logic runs at SIM_HZ regardless of how often we draw. RENDER_HZ can
+# be dropped (e.g. to 30) on slow machines without changing the outcome.
+SIM_HZ = 60
+RENDER_HZ = FPS
+AURA_SPEED = 60  # degrees per second
+BG_FRAME_TIME = 10 / 60  # seconds per background GIF frame
+
+# Combat tuning
+PUNCH_DAMAGE = 5
+SPECIAL_DAMAGE = 10  # plus SPECIAL_STAR_DAMAGE per special star
+SPECIAL_STAR_DAMAGE = 2
+SPECIAL_COST = 50
+ATTACK_COOLDOWN = 0.4  # seconds between attacks
+AURA_REGEN = 20  # aura per second while charging
+BLOCK_REDUCTION = 0.8  # share of damage a block stops
+PASSIVE_REDUCTION = 0.04  # share of damage each passive star stops
+DEFAULT_STARS = 3
+# Attacks are projectiles (see collision.py): size in px, speed in px/s
+PUNCH_SIZE = 24
+PUNCH_SPEED = 1500
+SPECIAL_SIZE = 48
+SPECIAL_SPEED = 1000
+SPECIAL_AURA_DRAIN = 10  # aura a landed special takes from the defender
+
+# Simulation state for rollback (see rollback.py): everything update() and
+# step() read or write, and nothing else. Floats stay doubles so a restored
+# state resimulates bit-for-bit like the original.
+FIGHTER_STATE = struct.Struct("<hdB??ddBd")  # health, aura, rounds won, blocking, charging, aura timers, attack, cooldown
+LEVEL_STATE = struct.Struct("<d?I")  # time left, timer running, ticks
+# ...followed by the projectiles in flight (ProjectilePool.snapshot)
+
+# Aura orbs: 12 orbs every 30 degrees on a 60px orbit. Unit vectors are
+# precomputed so a frame costs one cos/sin pair, not one per orb.
+ORBIT_RADIUS = 60
+ORBIT = [(math.cos(math.radians(i)), math.sin(math.radians(i))) for i in range(0, 360, 360 // AURA_ORBS)]
 
 # Colors
 WHITE = (255, 255, 255)
@@ -22,215 +73,495 @@ GREEN = (0, 255, 0)
 PURPLE = (147, 0, 211)
 BLACK = (0, 0, 0)
 
-# Initialize screen
-screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-pygame.display.set_caption("Ultimate Boxing Championship II")
-clock = pygame.time.Clock()
-
-# Fonts
-try:
-    game_font = pygame.font.Font("assets/PressStart2P-Regular.ttf", 24)
-    timer_font = pygame.font.Font("assets/PressStart2P-Regular.ttf", 48)
-except:
-    game_font = pygame.font.SysFont("Arial", 24)
-    timer_font = pygame.font.SysFont("Arial", 48)
-
-# Load music
-try:
-    mixer.music.load("assets/music/fight_theme.mp3")
-    mixer.music.play(-1)
-except:
-    print("Music file could not be loaded.")
-
-# Function to load and resize GIF frames
-def load_gif_frames(path: str, size: Tuple[int, int]) -> list:
-    frames = []
-    try:
-        img = Image.open(path)
-        for frame in range(img.n_frames):
-            img.seek(frame)
-            frame_img = img.convert("RGB").resize(size)
-
-            mode = frame_img.mode
-            data = frame_img.tobytes()
-            surface = pygame.image.fromstring(data, frame_img.size, mode)  # use resized size here
-            frames.append(surface)
-    except Exception as e:
-        print(f"Error loading GIF frames from: {path}\n{e}")
-    return frames
+# The display, clock and fonts are set up by init_display() so importing
+# this module (e.g. for headless simulation) doesn't open a window
+screen = None
+clock = None
+game_font = None
+timer_font = None
+renderer = DirtyRenderer()
+
+
+def init_display(headless=False):
+    # Shares the game's one window (see display.py); this only switches it to
+    # the fight's resolution and loads the fight's fonts the first time
+    global screen, clock, game_font, timer_font
+    screen = display.use((WINDOW_WIDTH, WINDOW_HEIGHT), CAPTION, headless)
+    clock = display.clock
+    renderer.surface = screen
+
+    # Fonts
+    if game_font is None:
+        try:
+            game_font = pygame.font.Font(FIGHT_FONT, 24)
+            timer_font = pygame.font.Font(FIGHT_FONT, 48)
+        except:
+            game_font = pygame.font.SysFont("Arial", 24)
+            timer_font = pygame.font.SysFont("Arial", 48)
+
+    sound_bank.play_music(FIGHT_MUSIC)
+    return screen
+
+
+def stars(character, key):
+    # Catalog records store ratings as (move name, stars), or None
+    rating = getattr(character, key, None)
+    return rating[1] if rating else DEFAULT_STARS
+
+
+def idle_policy(level, me, other, rng):
+    return 0
 
 
 class Fighter:
-    def __init__(self, name, color, position):
+    __slots__ = ("name", "color", "position", "passive", "special", "health", "aura", "rounds_won",
+                 "is_blocking", "aura_charging", "aura_timer", "prev_aura_timer", "attack", "cooldown", "sprite", "slot")
+
+    def __init__(self, name, color, position, passive=DEFAULT_STARS, special=DEFAULT_STARS):
         self.name = name
         self.color = color
         self.position = position
+        self.passive = passive
+        self.special = special
         self.health = 100
         self.aura = 100
         self.rounds_won = 0
         self.is_blocking = False
         self.aura_charging = False
         self.aura_timer = 0
-
-    def draw(self):
-        fighter_rect = pygame.Rect(self.position[0], self.position[1], 100, 200)
-        pygame.draw.rect(screen, self.color, fighter_rect)
+        self.prev_aura_timer = 0
+        self.attack = 0
+        self.cooldown = 0.0
+        self.sprite = None  # looked up in the atlas on first render; False if there is no art yet
+        self.slot = 0  # index in the level's CollisionWorld, which sets it
+
+    def apply_input(self, flags):
+        self.is_blocking = bool(flags & INPUT_BLOCK)
+        self.aura_charging = bool(flags & INPUT_CHARGE)
+        self.attack = flags & (INPUT_PUNCH | INPUT_SPECIAL)
+
+    def update(self, dt):
+        self.prev_aura_timer = self.aura_timer
+        if self.aura_charging:
+            self.aura_timer = (self.aura_timer + AURA_SPEED * dt) % 360
+            self.aura = min(100, self.aura + AURA_REGEN * dt)
+        self.cooldown = max(0.0, self.cooldown - dt)
+
+    def snapshot(self) -> bytes:
+        return FIGHTER_STATE.pack(self.health, self.aura, self.rounds_won, self.is_blocking, self.aura_charging,
+                                  self.aura_timer, self.prev_aura_timer, self.attack, self.cooldown)
+
+    def restore(self, data, offset=0):
+        (self.health, self.aura, self.rounds_won, self.is_blocking, self.aura_charging,
+         self.aura_timer, self.prev_aura_timer, self.attack, self.cooldown) = FIGHTER_STATE.unpack_from(data, offset)
+
+    def take_hit(self, damage):
+        if self.is_blocking:
+            damage *= 1 - BLOCK_REDUCTION
+        damage *= 1 - PASSIVE_REDUCTION * self.passive
+        self.health = max(0, self.health - max(1, round(damage)))
+
+    def hurtboxes(self):
+        return [(self.position[0], self.position[1], 100, 200)]
+
+    def aura_angle(self, alpha):
+        # Interpolate between the last two simulation steps, across the wrap
+        delta = (self.aura_timer - self.prev_aura_timer) % 360
+        return (self.prev_aura_timer + delta * alpha) % 360
+
+    def bounds(self):
+        # Body plus the orbit of the aura orbs
+        return pygame.Rect(self.position[0] - 15, self.position[1], 130, 200)
+
+    def orbit_points(self, alpha=1.0):
+        angle = math.radians(self.aura_angle(alpha))
+        c, s = math.cos(angle), math.sin(angle)
+        cx = self.position[0] + 50
+        cy = self.position[1] + 100
+        return [(int(cx + ORBIT_RADIUS * (ux * c - uy * s)), int(cy + ORBIT_RADIUS * (uy * c + ux * s)))
+                for ux, uy in ORBIT]
+
+    def render(self, alpha=1.0):
+        if self.sprite is None:
+            self.sprite = atlas.load().get(f"fighters/{atlas.slug(self.name)}/idle") or False
+        if self.sprite is not False:
+            screen.blit(self.sprite, self.position)
+        else:
+            pygame.draw.rect(screen, self.color, (self.position[0], self.position[1], 100, 200))
         if self.aura_charging:
-            self.aura_timer = (self.aura_timer + 1) % 360
-            for i in range(0, 360, 30):
-                angle = math.radians(i + self.aura_timer)
-                x = self.position[0] + 50 + 60 * math.cos(angle)
-                y = self.position[1] + 100 + 60 * math.sin(angle)
-                pygame.draw.circle(screen, PURPLE, (int(x), int(y)), 5)
+            orb = circle_sprite(PURPLE, 5)
+            points = self.orbit_points(alpha)[::governor.level.orb_stride]
+            screen.blits([(orb, (x - 5, y - 5)) for x, y in points], doreturn=False)
 
 class Level:
-    def __init__(self, player, opponent_name, opponent_color, bg_path=None):
+    def __init__(self, player, opponent, bg_path=None, bg_frames=None):
         self.round_time = 5
         self.current_time = self.round_time
         self.timer_active = True
 
-        self.player = Fighter(player["name"], player["color"], (200, 400))
-        self.opponent = Fighter(opponent_name, opponent_color, (900, 400))
+        self.player = Fighter(player.name, player.color, (200, 400),
+                              stars(player, "passive"), stars(player, "special"))
+        self.opponent = Fighter(opponent.name, opponent.color, (900, 400),
+                                stars(opponent, "passive"), stars(opponent, "special"))
+        self.fighters = [self.player, self.opponent]
+        self.hud = Hud(self.fighters, WINDOW_WIDTH)
+        self.collision = CollisionWorld(self.fighters, (0, 0, WINDOW_WIDTH, WINDOW_HEIGHT))
+        self.opponent_policy = idle_policy
+        self.rng = random.Random(0)
+        self.player_input = 0
+        self.ticks = 0
+        # InputRecorder, fed every tick by step()
+        self.recorder = None
+        # Visual effects only; stays None for headless simulation
+        self.particles = None
+        self.fx_rng = np.random.default_rng(0)
 
         # Background
-        self.bg_frames = load_gif_frames(bg_path, (WINDOW_WIDTH, WINDOW_HEIGHT)) if bg_path else []
+        if bg_frames is not None:
+            self.bg_frames = bg_frames
+        else:
+            self.bg_frames = stream_gif_frames(bg_path, (WINDOW_WIDTH, WINDOW_HEIGHT)) if bg_path else []
         self.bg_index = 0
         self.bg_timer = 0
+        self.bg_changed = False
+        self.bg_frame_time = BG_FRAME_TIME  # None holds the current frame
+        # The background animates on the render clock (run() feeds it), not
+        # in update(): it isn't simulation state, so rollback never sees it
+
+        self.sim_hz = SIM_HZ
+        self.render_hz = RENDER_HZ  # this level's cap; None draws every step
+        self.present_hz = RENDER_HZ  # what run() draws at: render_hz, capped again by the quality level
+        self.alpha = 1.0
+
+    def update_background(self, elapsed):
+        if self.bg_frames and self.bg_frame_time:
+            self.bg_timer += elapsed
+            if self.bg_timer >= self.bg_frame_time:
+                self.bg_timer -= self.bg_frame_time
+                self.bg_index = (self.bg_index + 1) % len(self.bg_frames)
+                self.bg_changed = True
+
+    def resolve_attack(self, attacker, defender):
+        # Throws the attack at the defender; it lands, or is blocked, when
+        # it gets there (resolve_hits)
+        if not attacker.attack or attacker.cooldown > 0 or attacker.is_blocking or attacker.aura_charging:
+            return
+        if attacker.attack & INPUT_SPECIAL and attacker.aura >= SPECIAL_COST:
+            attacker.aura -= SPECIAL_COST
+            self.launch(attacker, defender, SPECIAL, SPECIAL_SIZE, SPECIAL_SPEED,
+                        SPECIAL_DAMAGE + SPECIAL_STAR_DAMAGE * attacker.special, SPECIAL_AURA_DRAIN)
+        elif attacker.attack & INPUT_PUNCH:
+            self.launch(attacker, defender, PUNCH, PUNCH_SIZE, PUNCH_SPEED, PUNCH_DAMAGE)
+        else:
+            return
+        attacker.cooldown = ATTACK_COOLDOWN
+
+    def launch(self, attacker, defender, kind, size, speed, damage, aura_damage=0.0):
+        # From the attacker's chest, on the side facing the defender
+        x, y = attacker.position
+        if defender.position[0] >= x:
+            x += 100
+        else:
+            x -= size
+            speed = -speed
+        self.collision.projectiles.spawn(attacker.slot, kind, x, y + 60 - size // 2, size, size,
+                                         speed, 0.0, damage, aura_damage)
+
+    def resolve_hits(self, dt):
+        for fighter, kind in self.collision.step(dt):
+            if kind == SPECIAL:
+                self.emit_sparks(fighter, 40, WHITE)
+            else:
+                self.emit_sparks(fighter, 12, YELLOW)
+
+    def emit_sparks(self, fighter, count, color):
+        if self.particles is not None:
+            self.particles.burst(count, fighter.position[0] + 50, fighter.position[1] + 60, 300, 0.6,
+                                 circle_sprite(color, 3), self.fx_rng)
+
+    def is_over(self):
+        return self.current_time <= 0 or self.player.health <= 0 or self.opponent.health <= 0
+
+    def snapshot(self) -> bytes:
+        # About 100 bytes for the level's clock and both fighters, plus 55
+        # per projectile in flight
+        return (LEVEL_STATE.pack(self.current_time, self.timer_active, self.ticks)
+                + self.player.snapshot() + self.opponent.snapshot() + self.collision.projectiles.snapshot())
+
+    def restore(self, data):
+        self.current_time, self.timer_active, self.ticks = LEVEL_STATE.unpack_from(data)
+        self.player.restore(data, LEVEL_STATE.size)
+        self.opponent.restore(data, LEVEL_STATE.size + FIGHTER_STATE.size)
+        self.collision.projectiles.restore(data, LEVEL_STATE.size + 2 * FIGHTER_STATE.size)
+
+    def winner(self):
+        if self.player.health == self.opponent.health:
+            return None
+        return self.player if self.player.health > self.opponent.health else self.opponent
+
+    def update(self, dt):
+        # One fixed simulation step
+        if self.timer_active and self.current_time > 0:
+            self.current_time -= dt
+        self.player.update(dt)
+        self.opponent.update(dt)
+        if not self.is_over():
+            self.resolve_hits(dt)
+            self.resolve_attack(self.player, self.opponent)
+            self.resolve_attack(self.opponent, self.player)
+        if self.particles is not None:
+            self.particles.update(dt)
+        self.ticks += 1
+
+    def step(self, player_input, opponent_input, dt):
+        if self.recorder is not None:
+            self.recorder.record(player_input, opponent_input)
+        self.player.apply_input(player_input)
+        self.opponent.apply_input(opponent_input)
+        self.update(dt)
 
     def draw_background(self):
         if self.bg_frames:
-            self.bg_timer += 1
-            if self.bg_timer >= 10:
-                self.bg_timer = 0
-                self.bg_index = (self.bg_index + 1) % len(self.bg_frames)
             screen.blit(self.bg_frames[self.bg_index], (0, 0))
         else:
             screen.fill(BLACK)  # Placeholder if background is missing
 
-    def draw_health_bars(self):
-        pygame.draw.rect(screen, RED, (50, 50, 400, 30))
-        pygame.draw.rect(screen, GREEN, (50, 50, self.player.health * 4, 30))
-        pygame.draw.rect(screen, WHITE, (50, 50, 400, 30), 3)
-
-        pygame.draw.rect(screen, RED, (750, 50, 400, 30))
-        pygame.draw.rect(screen, GREEN, (750, 50, self.opponent.health * 4, 30))
-        pygame.draw.rect(screen, WHITE, (750, 50, 400, 30), 3)
-
-    def draw_aura_bars(self):
-        pygame.draw.rect(screen, BLUE, (50, 90, 400, 20))
-        pygame.draw.rect(screen, YELLOW, (50, 90, self.player.aura * 4, 20))
-        pygame.draw.rect(screen, WHITE, (50, 90, 400, 20), 2)
-
-        pygame.draw.rect(screen, BLUE, (750, 90, 400, 20))
-        pygame.draw.rect(screen, YELLOW, (750, 90, self.opponent.aura * 4, 20))
-        pygame.draw.rect(screen, WHITE, (750, 90, 400, 20), 2)
-
     def draw_timer(self):
-        timer_text = timer_font.render(str(max(0, int(self.current_time))), True, WHITE)
-        timer_rect = timer_text.get_rect(center=(WINDOW_WIDTH // 2, 60))
-        screen.blit(timer_text, timer_rect)
-
-    def draw_round_wins(self):
-        for i in range(self.player.rounds_won):
-            pygame.draw.circle(screen, YELLOW, (50 + i * 30, 130), 10)
-        for i in range(self.opponent.rounds_won):
-            pygame.draw.circle(screen, YELLOW, (1150 - i * 30, 130), 10)
-
-    def run(self):
-        running = True
-        while running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit(); sys.exit()
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        running = False
-                    elif event.key == pygame.K_SPACE:
-                        self.player.is_blocking = True
-                    elif event.key == pygame.K_LSHIFT:
-                        self.player.aura_charging = True
-                elif event.type == pygame.KEYUP:
-                    if event.key == pygame.K_SPACE:
-                        self.player.is_blocking = False
-                    elif event.key == pygame.K_LSHIFT:
-                        self.player.aura_charging = False
-
-            if self.timer_active and self.current_time > 0:
-                self.current_time -= 1 / FPS
-
+        # The timer changes every second; digits come from a glyph atlas
+        digits = text_cache.atlas(timer_font, WHITE)
+        text = str(max(0, int(self.current_time)))
+        digits.blit(screen, text, digits.get_rect(text, center=(WINDOW_WIDTH // 2, 60)))
+
+    def timer_rect(self):
+        rect = pygame.Rect((0, 0), timer_font.size("000"))
+        rect.center = (WINDOW_WIDTH // 2, 60)
+        return rect
+
+    def draw_scene(self):
+        with profiler.scope("background"):
             self.draw_background()
-            self.player.draw()
-            self.opponent.draw()
-            self.draw_health_bars()
-            self.draw_aura_bars()
+        with profiler.scope("fighters"):
+            self.player.render(self.alpha)
+            self.opponent.render(self.alpha)
+        with profiler.scope("projectiles"):
+            self.collision.projectiles.draw(screen, [circle_sprite(YELLOW, PUNCH_SIZE // 2),
+                                                     circle_sprite(WHITE, SPECIAL_SIZE // 2)])
+        if self.particles is not None:
+            with profiler.scope("particles"):
+                self.particles.draw(screen)
+        with profiler.scope("hud"):
+            self.hud.draw(screen)
             self.draw_timer()
-            self.draw_round_wins()
 
-                        # Check if time ran out
-            if self.current_time <= 0:
+    def track(self):
+        # Everything that can change between frames, keyed by what it shows
+        for side, fighter in (("player", self.player), ("opponent", self.opponent)):
+            # The flag stays separate from the angle: 0 degrees would compare equal to False
+            angle = int(fighter.aura_angle(self.alpha)) if fighter.aura_charging else None
+            renderer.track(f"{side}_body", fighter.bounds(), (fighter.color, fighter.aura_charging, angle))
+        projectiles = self.collision.projectiles
+        # Round sprites are a pixel wider than their hitboxes
+        renderer.track("projectiles", projectiles.bounds().inflate(4, 4), projectiles.count and self.ticks)
+        self.hud.track(renderer)
+        renderer.track("timer", self.timer_rect(), max(0, int(self.current_time)))
+        if self.particles is not None:
+            renderer.track("particles", self.particles.bounds(), self.particles.live and self.ticks)
+
+    def render(self, alpha=1.0):
+        self.alpha = alpha
+        # An animated background repaints everything anyway
+        if self.bg_changed:
+            self.bg_changed = False
+            renderer.invalidate()
+        self.hud.sync()
+        self.track()
+        profiler.track_overlay(renderer)
+        renderer.draw(self.draw_scene)
+        profiler.draw_overlay(screen)
+
+    def apply_quality(self, quality):
+        # Presentation only: none of this changes how the fight plays out
+        self.bg_frame_time = quality.bg_frame_time
+        self.present_hz = quality.render_hz if self.render_hz is None else min(self.render_hz, quality.render_hz)
+        if self.particles is not None:
+            self.particles.budget = max(1, int(self.particles.capacity * quality.particle_share))
+
+    def run(self, script=None, realtime=True, session=None):
+        # script(level, me, other, rng) -> input flags drives the player
+        # instead of the keyboard. realtime=False steps once per loop with no
+        # frame cap and returns as soon as the round ends (headless runs).
+        # session is a rollback.RollbackSession: the other fighter is then a
+        # remote player, and the round only ends once both sides agree.
+        init_display()
+        me, other = self.player, self.opponent
+        if session is not None and session.local == 1:
+            me, other = other, me
+        if self.particles is None:
+            self.particles = ParticlePool()
+        self.present_hz = self.render_hz
+        if realtime:
+            governor.reset()
+            self.apply_quality(governor.level)
+        running = True
+        renderer.reset()
+        stepper = FixedTimestep(self.sim_hz, self.present_hz)
+        profiler.set_fps(self.present_hz or self.sim_hz)
+        pipeline.reset()
+        if RECORD_DIR and realtime and self.recorder is None and session is None:
+            self.recorder = InputRecorder(self)
+        # Background clock: wall time between presented frames, or the
+        # simulated time stepped since the last one when not in real time
+        last_render = time.perf_counter()
+        since_render = 0.0
+        while running:
+            frame_start = time.perf_counter()
+            with profiler.scope("events"):
+                pipeline.poll(renderer.handle_event)
+            if pipeline.quit:
+                pygame.quit(); sys.exit()
+            if pygame.K_ESCAPE in pipeline.pressed:
+                running = False
+
+            with profiler.scope("update"):
+                steps = stepper.advance() if realtime else stepper.advance(stepper.dt)
+                if not realtime:
+                    since_render += steps * stepper.dt
+                for _ in range(steps):
+                    if script is not None:
+                        self.player_input = script(self, me, other, self.rng)
+                    else:
+                        self.player_input = pipeline.held
+                    if session is None:
+                        opponent_input = self.opponent_policy(self, self.opponent, self.player, self.rng)
+                        self.step(self.player_input, opponent_input, stepper.dt)
+                    elif self.is_over():
+                        session.hold()
+                    else:
+                        session.advance(self.player_input)
+            over = self.is_over() and (session is None or session.settled())
+
+            if not stepper.should_render() and not over:
+                if realtime:
+                    self.pace(frame_start, stepper)
+                continue
+            with profiler.scope("draw"):
+                if realtime:
+                    now = time.perf_counter()
+                    since_render, last_render = now - last_render, now
+                self.update_background(since_render)
+                since_render = 0.0
+                self.render(stepper.alpha)
+
+            # Check if the round is over
+            if over:
                 self.timer_active = False
-                win_text = game_font.render("You win! Press ENTER to continue...", True, WHITE)
+                winner = self.winner()
+                if winner is me:
+                    message = "You win! Press ENTER to continue..."
+                elif winner is None:
+                    message = "Draw! Press ENTER to continue..."
+                else:
+                    message = "You lose! Press ENTER to continue..."
+                if winner is not None:
+                    winner.rounds_won += 1
+                win_text = text_cache.render(game_font, message, WHITE)
                 screen.blit(win_text, (WINDOW_WIDTH // 2 - 250, WINDOW_HEIGHT // 2))
-                pygame.display.flip()
-
-                waiting = True
-                while waiting:
-                    for event in pygame.event.get():
-                        if event.type == pygame.QUIT:
-                            pygame.quit(); sys.exit()
-                        elif event.type == pygame.KEYDOWN:
-                            if event.key == pygame.K_RETURN:
-                                return True
-                            elif event.key == pygame.K_ESCAPE:
-                                pygame.quit(); sys.exit()
-                    clock.tick(FPS)
-
-            pygame.display.flip()
-            clock.tick(FPS)
+                renderer.invalidate(win_text.get_rect(topleft=(WINDOW_WIDTH // 2 - 250, WINDOW_HEIGHT // 2)))
+                renderer.present()
+                self.save_recording()
+                if session is not None:
+                    session.flush()
+                if not realtime:
+                    return True
+
+                key = pipeline.wait_for_key((pygame.K_RETURN, pygame.K_ESCAPE), renderer.handle_event)
+                if key == pygame.K_RETURN:
+                    return True
+                pygame.quit(); sys.exit()
+
+            with profiler.scope("flip"):
+                renderer.present()
+            # Closes the frame here so skipped-render iterations count
+            # towards the next presented frame
+            profiler.begin_frame()
+            if realtime:
+                self.pace(frame_start, stepper)
 
+        self.save_recording()
         return True
 
+    def pace(self, frame_start, stepper):
+        # Reports this loop's work to the quality governor, then waits for
+        # the next one
+        if governor.observe(time.perf_counter() - frame_start, 1.0 / self.sim_hz):
+            self.apply_quality(governor.level)
+            stepper.set_render_hz(self.present_hz)
+            profiler.set_fps(self.present_hz)
+        governor.tick(clock, self.sim_hz)
 
-def play_cutscene():
+    def save_recording(self):
+        if self.recorder is not None and self.recorder.ticks:
+            print(f"Inputs recorded to {self.recorder.save(RECORD_DIR)}")
+            self.recorder = None
+
+
+def play_cutscene(stage):
     screen.fill(BLACK)
-    text_lines = [
-        "After defeating your first opponent...",
-        "You prepare for the ultimate showdown.",
-        "Next Opponent: SHADOW VIPER.",
+    text_lines = stage.intro + [
+        f"Next Opponent: {stage.opponent.name}.",
         "Press ENTER to continue or ESC to quit."
     ]
     for i, line in enumerate(text_lines):
-        text = game_font.render(line, True, WHITE)
+        text = text_cache.render(game_font, line, WHITE)
         screen.blit(text, (100, 250 + i * 40))
     pygame.display.flip()
 
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_RETURN:
-                    return True
-                elif event.key == pygame.K_ESCAPE:
-                    return False
+    key = pipeline.wait_for_key((pygame.K_RETURN, pygame.K_ESCAPE))
+    if key is None:
+        pygame.quit(); sys.exit()
+    return key == pygame.K_RETURN
+
+def loaded_background(handle):
+    if handle is None:
+        return []
+    frames = wait_with_loading_bar(handle, screen, clock, FPS)
+    if frames is None:
+        pygame.quit(); sys.exit()
+    return frames
+
+def fight(player, bg_frames=None, stages=None):
+    # Plays the catalog's stages in order, with a cutscene before each one
+    # after the first. bg_frames, if given, is the first stage's background,
+    # already decoded; the rest are preloaded one stage ahead and let go of
+    # once played, so only two are ever resident. The first stage's belongs
+    # to FightScene, which keeps it between fights.
+    init_display()
+    stages = stages or catalog.load().levels
+    kept = stages[0].background_path
+    for i, stage in enumerate(stages):
+        if i + 1 < len(stages):
+            preload_background(stages[i + 1].background_path, (WINDOW_WIDTH, WINDOW_HEIGHT))
+        if i > 0 and not play_cutscene(stage):
+            print("Player chose not to continue.")
+            if stage.background_path != kept:
+                forget_background(stage.background_path)
+            return
+        if i == 0 and bg_frames is not None:
+            frames = bg_frames
+        else:
+            frames = loaded_background(preload_background(stage.background_path, (WINDOW_WIDTH, WINDOW_HEIGHT)))
+        level = Level(player, stage.opponent, bg_frames=frames)
+        if stage.round_time is not None:
+            level.round_time = level.current_time = stage.round_time
+        level.run()
+        if stage.background_path != kept:
+            forget_background(stage.background_path)
+            level = frames = None
+
 
 def main_game():
-    player_data = {
-        "name": "CRUSHER",
-        "color": BLUE
-    }
-
-    # Level 1
-    level1 = Level(player_data, "CPU", RED, bg_path="assets/background/underground.gif")
-    level1.run()
-
-    # Cutscene & transition
-    if play_cutscene():
-        # Level 2 with placeholder background
-        level2 = Level(player_data, "SHADOW VIPER", PURPLE, bg_path=None)  # Placeholder
-        level2.run()
-    else:
-        print("Player chose not to continue.")
+    init_display()
+    fight(catalog.Character("crusher", "CRUSHER", BLUE))
 
 if __name__ == "__main__":
     main_game()
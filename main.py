@@ -1,10 +1,24 @@
+import startup
 import pygame
 import sys
 import math
 import game_state
-
-pygame.init()
-pygame.mixer.init()
+import display
+import atlas
+import catalog
+from preloader import preloader, load_font, wait_with_loading_bar
+from scenes import Scene, SceneManager
+from sound_bank import sound_bank
+from inputs import pipeline
+from render import DirtyRenderer
+from text_cache import text_cache, get_sysfont
+from profiler import profiler
+from quality import governor, AUTO
+
+# levels and background (and with them the particle system, Pillow and the
+# disk cache) are only imported once the player heads for a fight, so they
+# stay off the menu's cold start
+startup.mark("imports")
 
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
@@ -17,34 +31,51 @@ BLUE = (37, 99, 235)
 YELLOW = (234, 179, 8)
 GRAY = (100, 100, 100)
 
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("UNTITLED BOXING")
-clock = pygame.time.Clock()
+# Display, fonts and sounds are set up by init_display() rather than at
+# import, so other modules (headless simulation, tools) can import the
+# roster and helpers without opening a window
+screen = None
+clock = None
+renderer = DirtyRenderer()
+title_font = menu_font = info_font = None
 
-# Load fonts
-try:
-    title_font = pygame.font.Font("freesansbold.ttf", 60)
-    menu_font = pygame.font.Font("freesansbold.ttf", 36)
-    info_font = pygame.font.Font("freesansbold.ttf", 20)
-except:
-    title_font = pygame.font.SysFont("Arial", 60)
-    menu_font = pygame.font.SysFont("Arial", 36)
-    info_font = pygame.font.SysFont("Arial", 20)
+# Decoded in the background once the menu is up; hovers are rate-limited
+# and confined to the UI channels so fast scrolling can't starve the rest
+sound_bank.register("select", "select.wav", group="ui")
+sound_bank.register("hover", "hover.wav", group="ui", volume=0.6, min_interval=0.04)
 
 # Placeholder assets
 bg_img = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
 bg_img.fill((20, 20, 50))
 
-# Sounds (optional)
-try:
-    select_sound = pygame.mixer.Sound("select.wav")
-    hover_sound = pygame.mixer.Sound("hover.wav")
-    pygame.mixer.music.load("menu_theme.mp3")
-    pygame.mixer.music.set_volume(0.5)
-    sound_loaded = True
-except:
-    sound_loaded = False
-    print("Sound files could not be loaded. Continuing without sound.")
+def convert_placeholders():
+    global bg_img
+    bg_img = display.convert(bg_img)
+
+display.when_ready(convert_placeholders)
+
+MENU_MUSIC = "menu_theme.mp3"
+
+def init_display(headless=False):
+    # The window itself is shared with the fight (see display.py); this
+    # switches it to the menu's size and loads the menu's fonts once
+    global screen, clock, title_font, menu_font, info_font
+    screen = display.use((SCREEN_WIDTH, SCREEN_HEIGHT), "UNTITLED BOXING", headless)
+    clock = display.clock
+    renderer.surface = screen
+    if title_font is not None:
+        return screen
+
+    # Load fonts
+    try:
+        title_font = pygame.font.Font("freesansbold.ttf", 60)
+        menu_font = pygame.font.Font("freesansbold.ttf", 36)
+        info_font = pygame.font.Font("freesansbold.ttf", 20)
+    except:
+        title_font = pygame.font.SysFont("Arial", 60)
+        menu_font = pygame.font.SysFont("Arial", 36)
+        info_font = pygame.font.SysFont("Arial", 20)
+    return screen
 
 menu_items = ["START FIGHT", "OPTIONS", "EXIT"]
 selected_item = 0
@@ -52,114 +83,136 @@ last_selected = 0
 animation_counter = 0
 
 # Characters
-characters = [
-    {
-        "name": "Den \"Phantom\" Lai",
-        "backstory": "Once a child of the streets of Neo Kowloon... vanished after a gang war.",
-        "passive": ("Fade Step", 4),
-        "special": ("Phase Strike", 5),
-        "color": BLUE
-    },
-    {
-        "name": "Kal \"Ghostline\" El",
-        "backstory": "Ex-agent betrayed and rebuilt by tech rebels... now hunts his enemies.",
-        "passive": ("Echo Reflex", 5),
-        "special": ("Blackout Field", 4),
-        "color": GRAY
-    },
-    {
-        "name": "Kira \"Razorfang\" Aoyama",
-        "backstory": "An experimental weapon from NeonGene Corp... seeks the truth of his past.",
-        "passive": ("Neural Reflex Sync", 5),
-        "special": ("Phantom Edge", 5),
-        "color": RED
-    }
-]
+characters = catalog.load().characters
 
 current_character = 0
 transition_alpha = 255
 transitioning = False
 transition_dir = 0
 
-# Draw helper
-star_img = pygame.Surface((20, 20))
-pygame.draw.polygon(star_img, YELLOW, [(10, 0), (12, 7), (20, 7), (14, 12),
-                                       (16, 20), (10, 15), (4, 20), (6, 12), (0, 7), (8, 7)])
-
 def draw_text(text, font, color, x, y):
-    surf = font.render(text, True, color)
+    surf = text_cache.render(font, text, color)
     screen.blit(surf, (x, y))
 
 def draw_stars(x, y, count):
-    for i in range(count):
-        screen.blit(star_img, (x + i * 25, y))
+    screen.blits(atlas.load().row("stars/menu", x, y, count, 25), doreturn=False)
 
 def draw_character_card(index):
     char = characters[index]
 
     screen.fill(BLACK)
-    pygame.draw.rect(screen, char["color"], (50, 150, 200, 300))  # Portrait box
+    if char.portrait is not None:
+        screen.blit(char.portrait, (50, 150))
+    else:
+        pygame.draw.rect(screen, char.color, (50, 150, 200, 300))  # Portrait box
     pygame.draw.rect(screen, WHITE, (50, 150, 200, 300), 3)
 
-    draw_text(char["name"], menu_font, YELLOW, 280, 150)
+    draw_text(char.name, menu_font, YELLOW, 280, 150)
     draw_text("Backstory:", info_font, WHITE, 280, 200)
-    draw_text(char["backstory"], info_font, GRAY, 280, 230)
+    draw_text(char.backstory, info_font, GRAY, 280, 230)
 
-    draw_text(f"Passive: {char['passive'][0]}", info_font, WHITE, 280, 280)
-    draw_stars(280, 310, char['passive'][1])
+    draw_text(f"Passive: {char.passive[0]}", info_font, WHITE, 280, 280)
+    draw_stars(280, 310, char.passive[1])
 
-    draw_text(f"Special: {char['special'][0]}", info_font, WHITE, 280, 360)
-    draw_stars(280, 390, char['special'][1])
+    draw_text(f"Special: {char.special[0]}", info_font, WHITE, 280, 360)
+    draw_stars(280, 390, char.special[1])
 
     draw_text("Press ENTER to select, ←/→ to switch, ESC to go back", info_font, GRAY, 200, 500)
 
-def character_select_screen():
-    global current_character, transitioning, transition_alpha, transition_dir
-    selecting = True
+def preload_fight_assets():
+    # GAMEPLAY is the only way forward from character select, so start on
+    # its assets while the player is still browsing
+    import levels
+    from background import preload_background
+    preload_background(catalog.load().levels[0].background_path, (levels.WINDOW_WIDTH, levels.WINDOW_HEIGHT))
+    preloader.submit("font:game", load_font, levels.FIGHT_FONT, 24)
+    preloader.submit("font:timer", load_font, levels.FIGHT_FONT, 48)
+
+def make_fade_surface():
     fade_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
     fade_surface.fill(BLACK)
+    return display.convert(fade_surface)
 
-    while selecting:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                return game_state.EXIT
-            if event.type == pygame.KEYDOWN:
-                if not transitioning:
-                    if event.key == pygame.K_ESCAPE:
-                        return game_state.MENU
-                    if event.key == pygame.K_RETURN:
-                        print("Character selected! Starting game...")
-                        return game_state.GAMEPLAY
-                    if event.key == pygame.K_RIGHT:
-                        current_character = (current_character + 1) % len(characters)
-                        transitioning = True
-                        transition_dir = -1
-                        transition_alpha = 255
-                    if event.key == pygame.K_LEFT:
-                        current_character = (current_character - 1) % len(characters)
-                        transitioning = True
-                        transition_dir = 1
-                        transition_alpha = 255
+def character_select_screen(fade_surface=None):
+    global current_character, transitioning, transition_alpha, transition_dir
+    preload_fight_assets()
+    selecting = True
+    if fade_surface is None:
+        fade_surface = make_fade_surface()
+    renderer.reset()
 
+    def draw_character_select():
         draw_character_card(current_character)
-
         if transitioning:
             fade_surface.set_alpha(transition_alpha)
             screen.blit(fade_surface, (0, 0))
+
+    idle = False
+    while selecting:
+        profiler.begin_frame()
+        with profiler.scope("events"):
+            # Nothing moves between switches, so sleep until a key arrives
+            pipeline.poll(renderer.handle_event, block=idle and not profiler.enabled)
+        if pipeline.quit:
+            return game_state.EXIT
+        for key in pipeline.pressed:
+            if not transitioning:
+                if key == pygame.K_ESCAPE:
+                    return game_state.MENU
+                if key == pygame.K_RETURN:
+                    print("Character selected! Starting game...")
+                    return game_state.GAMEPLAY
+                if key == pygame.K_RIGHT:
+                    current_character = (current_character + 1) % len(characters)
+                    transitioning = True
+                    transition_dir = -1
+                    transition_alpha = 255
+                if key == pygame.K_LEFT:
+                    current_character = (current_character - 1) % len(characters)
+                    transitioning = True
+                    transition_dir = 1
+                    transition_alpha = 255
+
+        # The card only changes on a switch or while the fade runs
+        renderer.track("card", screen.get_rect(), (current_character, transitioning and transition_alpha))
+        profiler.track_overlay(renderer)
+        with profiler.scope("draw"):
+            renderer.draw(draw_character_select)
+        profiler.draw_overlay(screen)
+
+        if transitioning:
             transition_alpha -= 15
             if transition_alpha <= 0:
                 transitioning = False
 
-        pygame.display.flip()
+        with profiler.scope("flip"):
+            renderer.present()
+        idle = not transitioning
         clock.tick(FPS)
 
+def menu_fighter_rects():
+    y_offset = math.sin(animation_counter * 0.05) * 10
+    return (pygame.Rect(50, 250 + y_offset, 150, 300),
+            pygame.Rect(SCREEN_WIDTH - 200, 250 - y_offset, 150, 300))
+
+def menu_item_rect(i, item):
+    rect = pygame.Rect((0, 0), menu_font.size(item))
+    rect.center = (SCREEN_WIDTH // 2, 300 + i * 60)
+    return rect
+
+def track_menu():
+    left, right = menu_fighter_rects()
+    renderer.track("left_fighter", left)
+    renderer.track("right_fighter", right)
+    for i, item in enumerate(menu_items):
+        renderer.track(f"item_{i}", menu_item_rect(i, item).inflate(32, 12), i == selected_item)
+
 def draw_menu():
-    global animation_counter
     screen.blit(bg_img, (0, 0))
 
-    y_offset = math.sin(animation_counter * 0.05) * 10
-    pygame.draw.rect(screen, BLUE, (50, 250 + y_offset, 150, 300))
-    pygame.draw.rect(screen, RED, (SCREEN_WIDTH - 200, 250 - y_offset, 150, 300))
+    left, right = menu_fighter_rects()
+    pygame.draw.rect(screen, BLUE, left)
+    pygame.draw.rect(screen, RED, right)
 
     pulse_value = (math.sin(animation_counter * 0.1) + 1) * 0.5
     glow_amount = int(3 + pulse_value * 5)
@@ -169,73 +222,185 @@ def draw_menu():
     for i, item in enumerate(menu_items):
         y_pos = 300 + i * 60
         color = YELLOW if i == selected_item else WHITE
-        text_surf = menu_font.render(item, True, color)
+        text_surf = text_cache.render(menu_font, item, color)
         rect = text_surf.get_rect(center=(SCREEN_WIDTH // 2, y_pos))
         screen.blit(text_surf, rect)
         if i == selected_item:
             pygame.draw.rect(screen, RED, rect.inflate(30, 10), 2)
 
-    draw_text("© 2025 G19 STUDIOS", pygame.font.SysFont("Arial", 16), WHITE, SCREEN_WIDTH // 2 - 80, SCREEN_HEIGHT - 30)
-    animation_counter += 1
+    draw_text("© 2025 G19 STUDIOS", get_sysfont("Arial", 16), WHITE, SCREEN_WIDTH // 2 - 80, SCREEN_HEIGHT - 30)
 
 def main_menu():
-    global selected_item, last_selected
-    if sound_loaded:
-        pygame.mixer.music.play(-1)
+    global selected_item, last_selected, animation_counter
+    renderer.reset()
+    music_started = False
 
     while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                return game_state.EXIT
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_UP:
-                    selected_item = (selected_item - 1) % len(menu_items)
-                    if sound_loaded and last_selected != selected_item:
-                        hover_sound.play()
-                elif event.key == pygame.K_DOWN:
-                    selected_item = (selected_item + 1) % len(menu_items)
-                    if sound_loaded and last_selected != selected_item:
-                        hover_sound.play()
-                elif event.key == pygame.K_RETURN:
-                    if sound_loaded:
-                        select_sound.play()
-                    if selected_item == 0:
-                        return game_state.CHARACTER_SELECT
-                    elif selected_item == 1:
-                        print("Options selected (not implemented)")
-                    elif selected_item == 2:
-                        return game_state.EXIT
+        profiler.begin_frame()
+        with profiler.scope("events"):
+            pipeline.poll(renderer.handle_event)
+        if pipeline.quit:
+            return game_state.EXIT
+        for key in pipeline.pressed:
+            if key == pygame.K_UP:
+                selected_item = (selected_item - 1) % len(menu_items)
+                if last_selected != selected_item:
+                    sound_bank.play("hover")
+            elif key == pygame.K_DOWN:
+                selected_item = (selected_item + 1) % len(menu_items)
+                if last_selected != selected_item:
+                    sound_bank.play("hover")
+            elif key == pygame.K_RETURN:
+                sound_bank.play("select")
+                if selected_item == 0:
+                    return game_state.CHARACTER_SELECT
+                elif selected_item == 1:
+                    return game_state.OPTIONS
+                elif selected_item == 2:
+                    return game_state.EXIT
         last_selected = selected_item
-        draw_menu()
-        pygame.display.flip()
+        track_menu()
+        profiler.track_overlay(renderer)
+        with profiler.scope("draw"):
+            renderer.draw(draw_menu)
+        profiler.draw_overlay(screen)
+        with profiler.scope("flip"):
+            renderer.present()
+        if not music_started:
+            # Starting the mixer can take a while on real audio devices, so
+            # do it once the menu is already on screen
+            startup.first_frame()
+            sound_bank.preload()
+            sound_bank.play_music(MENU_MUSIC)
+            music_started = True
+        animation_counter += 1
         clock.tick(FPS)
 
-def gameplay_loop():
-    running = True
-    while running:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+def draw_options():
+    screen.blit(bg_img, (0, 0))
+    draw_text("OPTIONS", title_font, RED, SCREEN_WIDTH // 2 - 130, 100)
+    text = text_cache.render(menu_font, f"QUALITY: {governor.describe()}", YELLOW)
+    rect = text.get_rect(center=(SCREEN_WIDTH // 2, 300))
+    screen.blit(text, rect)
+    pygame.draw.rect(screen, RED, rect.inflate(30, 10), 2)
+    hint = "AUTO follows how fast fights run" if governor.mode == AUTO else "Fixed for every fight"
+    draw_text(hint, info_font, GRAY, SCREEN_WIDTH // 2 - info_font.size(hint)[0] // 2, 360)
+    draw_text("←/→ to change, ENTER or ESC to go back", info_font, GRAY, 210, 500)
+
+def options_screen():
+    renderer.reset()
+    while True:
+        profiler.begin_frame()
+        with profiler.scope("events"):
+            # Static until a key arrives
+            pipeline.poll(renderer.handle_event, block=not profiler.enabled)
+        if pipeline.quit:
+            return game_state.EXIT
+        for key in pipeline.pressed:
+            if key in (pygame.K_ESCAPE, pygame.K_RETURN):
+                sound_bank.play("select")
+                return game_state.MENU
+            if key in (pygame.K_LEFT, pygame.K_RIGHT):
+                governor.cycle(1 if key == pygame.K_RIGHT else -1)
+                sound_bank.play("hover")
+        renderer.track("options", screen.get_rect(), governor.describe())
+        profiler.track_overlay(renderer)
+        with profiler.scope("draw"):
+            renderer.draw(draw_options)
+        profiler.draw_overlay(screen)
+        with profiler.scope("flip"):
+            renderer.present()
+        clock.tick(FPS)
+
+class MenuScene(Scene):
+    def enter(self, previous=None):
+        init_display()
+
+    def run(self):
+        return main_menu()
+
+
+class OptionsScene(Scene):
+    def enter(self, previous=None):
+        init_display()
+
+    def run(self):
+        return options_screen()
+
+
+class CharacterSelectScene(Scene):
+    def load(self):
+        self.fade_surface = make_fade_surface()
+        atlas.load()
+
+    def unload(self):
+        self.fade_surface = None
+
+    def enter(self, previous=None):
+        init_display()
+
+    def run(self):
+        return character_select_screen(self.fade_surface)
+
+    def resident_bytes(self):
+        from background import surface_bytes
+        return surface_bytes(self.fade_surface)
+
+
+class FightScene(Scene):
+    # Runs levels.fight in the shared window. The background stream and the
+    # fight fonts stay loaded between fights unless the scene is evicted.
+    def load(self):
+        import levels
+        self.size = (levels.WINDOW_WIDTH, levels.WINDOW_HEIGHT)
+        self.caption = levels.CAPTION
+        self.bg_frames = None
+
+    def unload(self):
+        self.bg_frames = None
+        from background import forget_background
+        forget_background(catalog.load().levels[0].background_path)
+
+    def enter(self, previous=None):
+        preload_fight_assets()
+
+    def run(self):
+        import levels
+        from background import preload_background
+        # Usually finished long ago; otherwise show a loading bar until it is
+        if self.bg_frames is None:
+            handle = preload_background(catalog.load().levels[0].background_path, self.size)
+            self.bg_frames = wait_with_loading_bar(handle, display.screen, display.clock, FPS)
+            if self.bg_frames is None:
                 return game_state.EXIT
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    return game_state.MENU
+        if levels.game_font is None:
+            fonts = [wait_with_loading_bar(preloader.get(name), display.screen, display.clock, FPS)
+                     for name in ("font:game", "font:timer")]
+            if None in fonts:
+                return game_state.EXIT
+            levels.game_font, levels.timer_font = fonts
+        levels.fight(characters[current_character], self.bg_frames)
+        return game_state.MENU
+
+    def resident_bytes(self):
+        from background import surface_bytes
+        if not self.bg_frames:
+            return 0
+        if hasattr(self.bg_frames, "resident_bytes"):
+            return self.bg_frames.resident_bytes()
+        return sum(surface_bytes(f) for f in self.bg_frames)
 
-        screen.fill((0, 100, 0))
-        draw_text("Gameplay - Press ESC to return to menu", menu_font, WHITE, 100, SCREEN_HEIGHT // 2)
-        pygame.display.flip()
-        clock.tick(FPS)
+
+scene_manager = SceneManager()
+scene_manager.register(game_state.MENU, MenuScene)
+scene_manager.register(game_state.CHARACTER_SELECT, CharacterSelectScene)
+scene_manager.register(game_state.OPTIONS, OptionsScene)
+scene_manager.register(game_state.GAMEPLAY, FightScene)
 
 def main():
-    current_state = game_state.MENU
-    while True:
-        if current_state == game_state.MENU:
-            current_state = main_menu()
-        elif current_state == game_state.CHARACTER_SELECT:
-            current_state = character_select_screen()
-        elif current_state == game_state.GAMEPLAY:
-            current_state = gameplay_loop()
-        elif current_state == game_state.EXIT:
-            break
+    init_display()
+    startup.mark("display")
+    scene_manager.run(game_state.MENU)
     pygame.quit()
     sys.exit()
 
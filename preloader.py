@@ -0,0 +1,114 @@
+import pygame
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Tuple
+
+from inputs import pipeline
+
+WHITE = (255, 255, 255)
+GRAY = (100, 100, 100)
+BLACK = (0, 0, 0)
+
+
+class AssetHandle:
+    # What the game loop holds while an asset loads in the background.
+    # `progress` goes from 0.0 to 1.0 and is safe to read every frame.
+    # `on_progress(name, progress)` is called from the worker thread.
+    def __init__(self, name: str, on_progress: Callable = None):
+        self.name = name
+        self.progress = 0.0
+        self.on_progress = on_progress
+        self.future = None
+
+    def report(self, done: int, total: int):
+        self.progress = done / total if total else 1.0
+        if self.on_progress:
+            self.on_progress(self.name, self.progress)
+
+    def ready(self) -> bool:
+        return self.future.done()
+
+    def result(self, timeout: float = None):
+        return self.future.result(timeout)
+
+
+class AssetPreloader:
+    # Small thread pool that loads the next state's assets while the current
+    # one is still on screen. PIL and SDL release the GIL while decoding, so
+    # threads are enough here and the results need no pickling.
+    def __init__(self, workers: int = 2):
+        self.workers = workers
+        self.pool = None
+        self.handles: Dict[str, AssetHandle] = {}
+        self.lock = threading.Lock()
+
+    def submit(self, name: str, job: Callable, *args, on_progress: Callable = None) -> AssetHandle:
+        # Jobs are called as job(report, *args). Asking for the same name
+        # twice returns the handle that is already loading.
+        with self.lock:
+            if name in self.handles:
+                return self.handles[name]
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="preload")
+            handle = AssetHandle(name, on_progress)
+            handle.future = self.pool.submit(self.run, handle, job, args)
+            self.handles[name] = handle
+            return handle
+
+    @staticmethod
+    def run(handle: AssetHandle, job: Callable, args: tuple):
+        result = job(handle.report, *args)
+        handle.report(1, 1)
+        return result
+
+    def get(self, name: str) -> AssetHandle:
+        return self.handles.get(name)
+
+    def forget(self, name: str):
+        with self.lock:
+            self.handles.pop(name, None)
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+
+def load_font(report, path: str, size: int, fallback: str = "Arial"):
+    try:
+        return pygame.font.Font(path, size)
+    except Exception:
+        return pygame.font.SysFont(fallback, size)
+
+
+def load_sound(report, path: str):
+    try:
+        return pygame.mixer.Sound(path)
+    except Exception:
+        print(f"Sound file could not be loaded: {path}")
+        return None
+
+
+def draw_loading_bar(surface: pygame.Surface, progress: float, rect: Tuple[int, int, int, int]):
+    x, y, w, h = rect
+    pygame.draw.rect(surface, GRAY, rect)
+    pygame.draw.rect(surface, WHITE, (x, y, int(w * max(0.0, min(1.0, progress))), h))
+    pygame.draw.rect(surface, WHITE, rect, 2)
+
+
+def wait_with_loading_bar(handle: AssetHandle, surface: pygame.Surface, clock: pygame.time.Clock, fps: int):
+    # Only shows anything if the asset isn't ready yet; keeps the window
+    # responsive instead of blocking on the future
+    width, height = surface.get_size()
+    while not handle.ready():
+        pipeline.poll()
+        if pipeline.quit:
+            return None
+        surface.fill(BLACK)
+        draw_loading_bar(surface, handle.progress, (width // 4, height // 2 - 10, width // 2, 20))
+        pygame.display.flip()
+        clock.tick(fps)
+    return handle.result()
+
+
+preloader = AssetPreloader()
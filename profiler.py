@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import pygame
+from collections import deque
+from text_cache import text_cache, get_sysfont
+
+PROFILE_HISTORY = 600  # frames kept for percentiles (10 s at 60 FPS)
+TRACE_LIMIT = 200000  # scope events kept for the Chrome trace
+TRACE_PATH = os.environ.get("UB_PROFILE_TRACE", "frame_trace.json")
+OVERLAY_KEY = pygame.K_F3
+EXPORT_KEY = pygame.K_F4
+
+WHITE = (255, 255, 255)
+YELLOW = (234, 179, 8)
+
+
+class NullScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SCOPE = NullScope()
+
+
+class Scope:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+class Ring:
+    # Fixed-size float history; percentiles sort a copy on demand only
+    __slots__ = ("values", "index", "full")
+
+    def __init__(self, size):
+        self.values = [0.0] * size
+        self.index = 0
+        self.full = False
+
+    def push(self, value):
+        self.values[self.index] = value
+        self.index += 1
+        if self.index == len(self.values):
+            self.index = 0
+            self.full = True
+
+    def items(self):
+        return self.values if self.full else self.values[:self.index]
+
+    def percentile(self, p):
+        items = sorted(self.items())
+        if not items:
+            return 0.0
+        return items[min(len(items) - 1, int(p / 100 * len(items)))]
+
+    def mean(self):
+        items = self.items()
+        return sum(items) / len(items) if items else 0.0
+
+
+class FrameProfiler:
+    # Opt-in frame timing. Wrap hot paths in `with profiler.scope("name"):`
+    # and call begin_frame() once per presented frame. While disabled,
+    # scope() hands back a shared no-op context manager and begin_frame()
+    # returns immediately, so instrumented code costs next to nothing.
+    def __init__(self, fps=60, enabled=False, history=PROFILE_HISTORY):
+        self.enabled = enabled
+        self.tracing = enabled
+        self.overlay = False
+        self.history = history
+        self.budget = 1.0 / fps
+        self.frames = Ring(history)
+        self.scopes = {}
+        self.current = {}
+        self.trace = deque(maxlen=TRACE_LIMIT)
+        self.frame_start = None
+        self.frame_count = 0
+        self.dropped = 0
+        self.lines = []
+
+    def set_fps(self, fps):
+        self.budget = 1.0 / fps
+
+    def enable(self, tracing=True):
+        self.enabled = True
+        self.tracing = tracing
+
+    def disable(self):
+        self.enabled = False
+        self.frame_start = None
+
+    def scope(self, name):
+        return Scope(self, name) if self.enabled else NULL_SCOPE
+
+    def record(self, name, start, end):
+        self.current[name] = self.current.get(name, 0.0) + (end - start)
+        if self.tracing:
+            self.trace.append((name, start, end))
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            frame_time = now - self.frame_start
+            self.frames.push(frame_time)
+            self.frame_count += 1
+            # Anything past 1.5 budgets missed at least one refresh
+            if frame_time > self.budget * 1.5:
+                self.dropped += 1
+            for name in set(self.scopes) | set(self.current):
+                ring = self.scopes.get(name)
+                if ring is None:
+                    ring = self.scopes[name] = Ring(self.history)
+                ring.push(self.current.get(name, 0.0))
+            if self.tracing:
+                self.trace.append(("frame", self.frame_start, now))
+        self.current = {}
+        self.frame_start = now
+
+    def stats(self):
+        return {
+            "frames": self.frame_count,
+            "dropped": self.dropped,
+            "frame_ms": {"p50": self.frames.percentile(50) * 1000,
+                         "p95": self.frames.percentile(95) * 1000,
+                         "p99": self.frames.percentile(99) * 1000},
+            "scopes_ms": {name: ring.mean() * 1000 for name, ring in self.scopes.items()},
+        }
+
+    def reset(self):
+        self.frames = Ring(self.history)
+        self.scopes = {}
+        self.current = {}
+        self.trace.clear()
+        self.frame_start = None
+        self.frame_count = 0
+        self.dropped = 0
+
+    def export_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.stats(), f, indent=2)
+
+    def export_chrome_trace(self, path=TRACE_PATH):
+        # Loadable in chrome://tracing or Perfetto
+        events = [{"name": name, "ph": "X", "pid": 0, "tid": 0 if name == "frame" else 1,
+                   "ts": start * 1e6, "dur": (end - start) * 1e6} for name, start, end in self.trace]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return path
+
+    def handle_event(self, event):
+        if event.type != pygame.KEYDOWN:
+            return
+        if event.key == OVERLAY_KEY:
+            self.overlay = not self.overlay
+            if self.overlay and not self.enabled:
+                self.enable(tracing=False)
+        elif event.key == EXPORT_KEY and self.enabled:
+            print(f"Frame trace written to {self.export_chrome_trace()}")
+
+    def overlay_lines(self):
+        frames = self.frames
+        lines = [
+            f"frame p50 {frames.percentile(50) * 1000:5.1f}  p95 {frames.percentile(95) * 1000:5.1f}  "
+            f"p99 {frames.percentile(99) * 1000:5.1f} ms",
+            f"dropped {self.dropped} / {self.frame_count}",
+        ]
+        for name, ring in sorted(self.scopes.items()):
+            lines.append(f"{name:<12} {ring.mean() * 1000:6.2f} ms")
+        return lines
+
+    def overlay_rect(self):
+        if not self.overlay:
+            return pygame.Rect(0, 0, 0, 0)
+        return pygame.Rect(4, 4, 300, 18 * (2 + len(self.scopes)) + 8)
+
+    def track_overlay(self, renderer):
+        # Keep the overlay's area in the dirty-rect renderer's redraw set
+        renderer.track("profiler", self.overlay_rect(), self.overlay and self.frame_count)
+
+    def draw_overlay(self, surface):
+        if not self.overlay:
+            return
+        # Refresh the numbers a few times a second so they stay readable and
+        # don't churn the text cache
+        if not self.lines or self.frame_count % 15 == 0:
+            self.lines = self.overlay_lines()
+        rect = self.overlay_rect()
+        surface.fill((0, 0, 0), rect)
+        font = get_sysfont("Arial", 16)
+        for i, line in enumerate(self.lines):
+            color = YELLOW if i < 2 else WHITE
+            surface.blit(text_cache.render(font, line, color), (rect.x + 6, rect.y + 4 + i * 18))
+
+
+profiler = FrameProfiler(enabled=os.environ.get("UB_PROFILE") == "1")
@@ -0,0 +1,143 @@
+import os
+import time
+
+from profiler import Ring
+
+# Fight quality levels, best first. In AUTO the governor below moves between
+# them from measured frame times; the OPTIONS screen can pin one instead.
+# Set the starting mode with UB_QUALITY=<name>. Nothing here imports the
+# fight's modules, so the menu can use it without loading them.
+AUTO = "AUTO"
+WINDOW = 60  # frames measured per decision, a second at 60 Hz
+DOWNGRADE_AT = 1.0  # p90 frame work past this share of the budget steps down
+UPGRADE_AT = 0.5  # windows with p90 under this share count towards stepping up
+UPGRADE_WINDOWS = 5  # that many good windows in a row before stepping up...
+MAX_UPGRADE_WINDOWS = 80  # ...doubling, up to this, each time a step up fails straight away
+AURA_ORBS = 12  # orbs on the full aura orbit (levels.ORBIT)
+
+
+class QualityLevel:
+    # bg_frame_time: seconds per background GIF frame, None to hold the first
+    # render_hz: presented frames per second (the simulation stays at SIM_HZ)
+    # particle_share: share of the particle pool that may be live at once
+    # aura_orbs: orbs drawn around a charging fighter, a divisor of
+    #   AURA_ORBS so they stay evenly spaced; orb_stride is every how many
+    #   orbit points one is drawn
+    # busy_loop: pace with Clock.tick_busy_loop, which spins for an exact
+    #   frame time, rather than Clock.tick, which sleeps and leaves the CPU to
+    #   background decoding at the cost of a millisecond or so of jitter
+    __slots__ = ("name", "bg_frame_time", "render_hz", "particle_share", "aura_orbs", "orb_stride", "busy_loop")
+
+    def __init__(self, name, bg_frame_time, render_hz, particle_share, aura_orbs, busy_loop):
+        self.name = name
+        self.bg_frame_time = bg_frame_time
+        self.render_hz = render_hz
+        self.particle_share = particle_share
+        if aura_orbs <= 0 or AURA_ORBS % aura_orbs:
+            raise ValueError(f"{name}: aura_orbs must divide {AURA_ORBS}, got {aura_orbs}")
+        self.aura_orbs = aura_orbs
+        self.orb_stride = AURA_ORBS // aura_orbs
+        self.busy_loop = busy_loop
+
+
+LEVELS = [
+    QualityLevel("HIGH", 10 / 60, 60, 1.0, 12, True),
+    QualityLevel("MEDIUM", 20 / 60, 60, 1 / 4, 12, False),
+    QualityLevel("LOW", 40 / 60, 30, 1 / 16, 6, False),
+    QualityLevel("LOWEST", None, 30, 1 / 64, 4, False),
+]
+MODES = [AUTO] + [level.name for level in LEVELS]
+
+
+class QualityGovernor:
+    # Fed the work time of every fight frame (everything but the wait for
+    # the next one). One bad window steps down straight away; stepping back
+    # up takes upgrade_windows good ones in a row, and the gap between the
+    # two thresholds plus that wait keeps it from flapping between levels.
+    # A step up that fails within a window doubles the wait next time.
+    def __init__(self, mode: str = AUTO, window: int = WINDOW):
+        self.mode = mode if mode in MODES else AUTO
+        self.index = 0  # the level AUTO is on
+        self.samples = Ring(window)
+        self.upgrade_windows = UPGRADE_WINDOWS
+        self.good_windows = 0
+        self.since_upgrade = None
+        self.changes = 0
+
+    @property
+    def level(self) -> QualityLevel:
+        return LEVELS[self.index] if self.mode == AUTO else LEVELS[MODES.index(self.mode) - 1]
+
+    def set_mode(self, mode: str):
+        self.mode = mode
+        self.reset()
+
+    def cycle(self, step: int = 1) -> str:
+        self.set_mode(MODES[(MODES.index(self.mode) + step) % len(MODES)])
+        return self.mode
+
+    def reset(self):
+        # Starting a fight: earlier frames say nothing about this one
+        self.samples = Ring(len(self.samples.values))
+        self.good_windows = 0
+        self.since_upgrade = None
+
+    def observe(self, seconds: float, budget: float) -> bool:
+        # True when the level changed and should be applied
+        samples = self.samples
+        samples.push(seconds)
+        if self.mode != AUTO or not samples.full or samples.index:
+            return False
+        load = samples.percentile(90) / budget
+        self.samples = Ring(len(samples.values))
+        if self.since_upgrade is not None:
+            self.since_upgrade += 1
+        if load > DOWNGRADE_AT:
+            self.good_windows = 0
+            if self.index == len(LEVELS) - 1:
+                return False
+            if self.since_upgrade == 1:
+                self.upgrade_windows = min(MAX_UPGRADE_WINDOWS, self.upgrade_windows * 2)
+            self.since_upgrade = None
+            self.index += 1
+            self.changes += 1
+            return True
+        self.good_windows = self.good_windows + 1 if load < UPGRADE_AT else 0
+        if self.good_windows >= self.upgrade_windows and self.index > 0:
+            self.good_windows = 0
+            self.since_upgrade = 0
+            self.index -= 1
+            self.changes += 1
+            return True
+        return False
+
+    def tick(self, clock, fps: int):
+        if self.level.busy_loop:
+            clock.tick_busy_loop(fps)
+        else:
+            clock.tick(fps)
+
+    def describe(self) -> str:
+        return f"AUTO ({self.level.name})" if self.mode == AUTO else self.mode
+
+
+governor = QualityGovernor(os.environ.get("UB_QUALITY", AUTO).upper())
+
+
+if __name__ == "__main__":
+    # Replays synthetic frame times through the governor: a machine that
+    # manages HIGH, slows down for a while, then recovers
+    budget = 1 / 60
+    phases = [("fast", 8e-3, 10), ("slow", 22e-3, 5), ("fast", 6e-3, 40)]
+    gov = QualityGovernor()
+    start = time.perf_counter()
+    frames = 0
+    for name, cost, seconds in phases:
+        # Lower levels do less work per frame
+        for _ in range(seconds * 60):
+            scale = (1.0, 0.8, 0.6, 0.5)[gov.index]
+            if gov.observe(cost * scale, budget):
+                print(f"{frames / 60:6.1f}s ({name}): -> {gov.level.name}")
+            frames += 1
+    print(f"{frames} frames, {gov.changes} changes, "
+          f"{(time.perf_counter() - start) / frames * 1e6:.2f}us per observe")
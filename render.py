@@ -0,0 +1,106 @@
+import pygame
+from typing import Callable, Dict, Tuple
+
+# Past this fraction of the screen a single flip is cheaper than many updates
+FULL_FLIP_COVERAGE = 0.5
+
+EXPOSE_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED, pygame.WINDOWSIZECHANGED)
+
+
+class DirtyRenderer:
+    # Retained-mode presenter. Each frame the loop declares every drawable
+    # that can change with track(key, rect, state); only drawables whose rect
+    # or state differ from last frame are redrawn (with the surface clipped to
+    # them) and pushed with pygame.display.update(rects). invalidate() with no
+    # rect forces a normal full redraw + flip, e.g. on entering a state or
+    # when an animated background advances.
+    def __init__(self, surface: pygame.Surface = None):
+        self.surface = surface
+        self.drawables: Dict[str, Tuple[pygame.Rect, object]] = {}
+        self.dirty = []
+        self.full = True
+        self.merged = None
+        self.frames = 0
+        self.full_frames = 0
+        self.partial_frames = 0
+        self.idle_frames = 0
+
+    def target(self) -> pygame.Surface:
+        return self.surface or pygame.display.get_surface()
+
+    def invalidate(self, rect=None):
+        if rect is None:
+            self.full = True
+        else:
+            self.dirty.append(pygame.Rect(rect))
+        self.merged = None
+
+    def reset(self):
+        self.drawables.clear()
+        self.invalidate()
+
+    def handle_event(self, event: pygame.event.Event):
+        if event.type in EXPOSE_EVENTS:
+            self.invalidate()
+
+    def track(self, key: str, rect, state=None):
+        rect = pygame.Rect(rect)
+        old = self.drawables.get(key)
+        if old is not None and old[0] == rect and old[1] == state:
+            return
+        if old is not None:
+            self.dirty.append(old[0])
+        self.dirty.append(rect)
+        self.drawables[key] = (rect, state)
+        self.merged = None
+
+    def regions(self) -> list:
+        if self.merged is not None:
+            return self.merged
+        bounds = self.target().get_rect()
+        merged = []
+        for rect in self.dirty:
+            rect = rect.clip(bounds)
+            if not rect.w or not rect.h:
+                continue
+            # Fold overlapping rects together so no pixel is drawn twice
+            i = rect.collidelist(merged)
+            while i != -1:
+                rect.union_ip(merged.pop(i))
+                i = rect.collidelist(merged)
+            merged.append(rect)
+        if sum(r.w * r.h for r in merged) > bounds.w * bounds.h * FULL_FLIP_COVERAGE:
+            self.full = True
+        self.merged = merged
+        return merged
+
+    def needs_redraw(self) -> bool:
+        return self.full or bool(self.regions())
+
+    def draw(self, draw_fn: Callable):
+        # draw_fn must repaint everything (background included) and have no
+        # side effects, since it runs once per dirty region
+        regions = self.regions()
+        if self.full:
+            draw_fn()
+            return
+        surface = self.target()
+        for rect in regions:
+            surface.set_clip(rect)
+            draw_fn()
+        surface.set_clip(None)
+
+    def present(self):
+        regions = self.regions()
+        if self.full:
+            pygame.display.flip()
+            self.full_frames += 1
+        elif regions:
+            pygame.display.update(regions)
+            self.partial_frames += 1
+        else:
+            self.idle_frames += 1
+        self.frames += 1
+        self.dirty = []
+        self.full = False
+        self.merged = None
@@ -0,0 +1,398 @@
+import os
+import sys
+import time
+import heapq
+import random
+import socket
+import struct
+import argparse
+from collections import deque
+
+# Nothing here needs a window unless a fight is played (see play())
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import catalog
+from levels import Level, SIM_HZ
+from profiler import profiler
+
+# Rollback netcode for two-player fights. Every frame each side simulates
+# straight away with its own input and a guess for the remote one (the last
+# input that actually arrived). When the real input turns up and differs,
+# the level is restored to its snapshot from that frame and the frames since
+# are simulated again, all inside one render frame. Levels only ever run on
+# the inputs both sides agree on, so the fights stay in sync without either
+# player waiting on the network.
+MAX_ROLLBACK = 8  # frames we may run ahead of the last confirmed remote input
+INPUT_DELAY = 0  # frames local input is held back, trading latency for fewer rollbacks
+MAX_REDUNDANT = 64  # unacknowledged inputs resent in every packet, so a lost packet costs nothing
+DEFAULT_PORT = 7470
+
+# Packet: first frame it carries, how many remote frames the sender has
+# (an ack), input count, then one byte of input flags per frame
+PACKET = struct.Struct("<IIB")
+
+
+class LoopbackTransport:
+    # In-process transport for tests and benchmarks. Packets are delivered
+    # after `latency` seconds plus up to `jitter`, and dropped with
+    # probability `loss`. `clock` can be swapped for a simulated one so a run
+    # is reproducible.
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, loss: float = 0.0, seed: int = 0,
+                 clock=time.perf_counter):
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.clock = clock
+        self.peer = None
+        self.queue = []
+        self.sent = 0
+        self.dropped = 0
+
+    @classmethod
+    def pair(cls, latency: float = 0.0, jitter: float = 0.0, loss: float = 0.0, seed: int = 0, clock=time.perf_counter):
+        a = cls(latency, jitter, loss, seed, clock)
+        b = cls(latency, jitter, loss, seed + 1, clock)
+        a.peer, b.peer = b, a
+        return a, b
+
+    def send(self, data: bytes):
+        self.sent += 1
+        if self.rng.random() < self.loss:
+            self.dropped += 1
+            return
+        deliver_at = self.clock() + self.latency + self.rng.uniform(0.0, self.jitter)
+        heapq.heappush(self.peer.queue, (deliver_at, self.sent, data))
+
+    def receive(self) -> list:
+        now = self.clock()
+        packets = []
+        while self.queue and self.queue[0][0] <= now:
+            packets.append(heapq.heappop(self.queue)[2])
+        return packets
+
+    def close(self):
+        self.queue.clear()
+
+
+class UdpTransport:
+    # Non-blocking UDP between two ports, localhost by default. Packets from
+    # anyone but the peer are ignored.
+    def __init__(self, port: int, peer_port: int, host: str = "127.0.0.1", peer_host: str = "127.0.0.1"):
+        self.peer = (peer_host, peer_port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.sent = 0
+        self.dropped = 0
+
+    def send(self, data: bytes):
+        self.sent += 1
+        try:
+            self.sock.sendto(data, self.peer)
+        except OSError:
+            # Full buffer or nobody listening yet; the next packet resends it all
+            self.dropped += 1
+
+    def receive(self) -> list:
+        packets = []
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                return packets
+            except OSError:
+                # ICMP port unreachable from an earlier send, on some platforms
+                continue
+            if addr[1] == self.peer[1]:
+                packets.append(data)
+
+    def close(self):
+        self.sock.close()
+
+
+class RollbackSession:
+    # Drives one Level for one side of a match. local=0 plays level.player,
+    # local=1 level.opponent; both sides must start from the same level.
+    # advance() runs one frame, or returns False without simulating when we
+    # are MAX_ROLLBACK frames ahead of the remote input (a stall).
+    def __init__(self, level: Level, transport, local: int = 0, input_delay: int = INPUT_DELAY,
+                 max_rollback: int = MAX_ROLLBACK):
+        self.level = level
+        self.transport = transport
+        self.local = local
+        self.input_delay = input_delay
+        self.max_rollback = max_rollback
+        self.dt = 1.0 / level.sim_hz
+        self.frame = 0  # next frame to simulate
+        # Local inputs by frame; the first input_delay frames are idle
+        self.local_inputs = {f: 0 for f in range(input_delay)}
+        self.local_known = input_delay
+        self.peer_ack = 0
+        self.remote_inputs = {}
+        self.remote_received = 0  # remote inputs known for every frame below this
+        self.last_remote = 0  # the newest of those, our guess for frames still to come
+        self.predicted = {}  # frame -> remote input we guessed, until the real one arrives
+        self.snapshots = {}  # frame -> level state before that frame
+        self.history = bytearray()  # confirmed frames, player flags low nibble, opponent high
+        self.rollbacks = 0
+        self.resim_frames = 0
+        self.max_resim = 0
+        self.stalls = 0
+        self.resim_ms = deque(maxlen=600)
+
+    def order(self, local_flags: int, remote_flags: int):
+        return (local_flags, remote_flags) if self.local == 0 else (remote_flags, local_flags)
+
+    def me(self):
+        return self.level.player if self.local == 0 else self.level.opponent
+
+    def advance(self, flags: int) -> bool:
+        self.poll()
+        if self.frame - self.remote_received >= self.max_rollback:
+            self.stalls += 1
+            self.send()
+            return False
+        if self.local_known <= self.frame + self.input_delay:
+            self.local_inputs[self.local_known] = flags
+            self.local_known += 1
+        self.send()
+        self.simulate(self.frame)
+        self.frame += 1
+        self.trim()
+        return True
+
+    def hold(self):
+        # Called instead of advance() once the round looks over. We stop
+        # simulating but keep exchanging inputs, since a late one may still
+        # roll the KO back.
+        self.poll()
+        self.commit_idle()
+        self.send()
+        self.trim()
+
+    def commit_idle(self):
+        # We won't simulate further (for now), so promise idle inputs for as
+        # far as the peer can have run ahead of us; it can then settle even
+        # if it stopped a few frames later than we did
+        end = self.frame + self.input_delay + self.max_rollback + 1
+        while self.local_known < end:
+            self.local_inputs[self.local_known] = 0
+            self.local_known += 1
+
+    def settled(self) -> bool:
+        # Every simulated frame used the real remote input
+        return self.remote_received >= self.frame
+
+    def flush(self, copies: int = 5):
+        # Leaving the match: repeat our last packet so one lost datagram
+        # can't leave the peer waiting for inputs forever
+        self.commit_idle()
+        for _ in range(copies):
+            self.send()
+
+    def simulate(self, frame: int):
+        self.snapshots[frame] = self.level.snapshot()
+        remote = self.remote_inputs.get(frame)
+        if remote is None:
+            remote = self.last_remote
+            self.predicted[frame] = remote
+        else:
+            self.predicted.pop(frame, None)
+        self.level.step(*self.order(self.local_inputs.get(frame, 0), remote), self.dt)
+
+    def poll(self):
+        rollback_to = None
+        for packet in self.transport.receive():
+            start, ack, count = PACKET.unpack_from(packet)
+            self.peer_ack = max(self.peer_ack, ack)
+            for i, flags in enumerate(packet[PACKET.size:PACKET.size + count]):
+                frame = start + i
+                if frame in self.remote_inputs or frame < self.remote_received:
+                    continue
+                self.remote_inputs[frame] = flags
+                guess = self.predicted.pop(frame, None)
+                if guess is not None and guess != flags and (rollback_to is None or frame < rollback_to):
+                    rollback_to = frame
+        while self.remote_received in self.remote_inputs:
+            self.last_remote = self.remote_inputs[self.remote_received]
+            self.remote_received += 1
+        if rollback_to is not None:
+            self.rollback(rollback_to)
+
+    def rollback(self, start: int):
+        with profiler.scope("rollback"):
+            began = time.perf_counter()
+            # Effects aren't part of the state; replayed hits don't spark twice
+            particles, self.level.particles = self.level.particles, None
+            self.level.restore(self.snapshots[start])
+            for frame in range(start, self.frame):
+                self.simulate(frame)
+            self.level.particles = particles
+        count = self.frame - start
+        self.rollbacks += 1
+        self.resim_frames += count
+        self.max_resim = max(self.max_resim, count)
+        self.resim_ms.append((time.perf_counter() - began) * 1000)
+
+    def send(self):
+        start = max(self.peer_ack, self.local_known - MAX_REDUNDANT)
+        inputs = bytes(self.local_inputs[f] for f in range(start, self.local_known))
+        self.transport.send(PACKET.pack(start, self.remote_received, len(inputs)) + inputs)
+
+    def trim(self):
+        # Frames both sides have confirmed can't be rolled back to any more
+        confirmed = min(self.remote_received, self.frame)
+        for frame in range(len(self.history), confirmed):
+            local, remote = self.local_inputs[frame], self.remote_inputs.pop(frame)
+            player, opponent = self.order(local, remote)
+            self.history.append(player & 0x0F | (opponent & 0x0F) << 4)
+            self.snapshots.pop(frame, None)
+        for frame in [f for f in self.local_inputs if f < min(self.peer_ack, confirmed)]:
+            del self.local_inputs[frame]
+
+    def stats(self) -> dict:
+        resim = sorted(self.resim_ms)
+        return {
+            "frames": self.frame,
+            "confirmed": len(self.history),
+            "rollbacks": self.rollbacks,
+            "resim_frames": self.resim_frames,
+            "max_resim": self.max_resim,
+            "stalls": self.stalls,
+            "resim_ms_p50": resim[len(resim) // 2] if resim else 0.0,
+            "resim_ms_max": resim[-1] if resim else 0.0,
+            "sent": self.transport.sent,
+            "dropped": self.transport.dropped,
+        }
+
+
+def new_level(player: str, opponent: str) -> Level:
+    roster = catalog.load()
+    return Level(roster.find(player), roster.find(opponent))
+
+
+def simulate_netplay(player, opponent, policy_a, policy_b, frames=1800, latency=0.08, jitter=0.02, loss=0.05,
+                     seed=0, round_time=60):
+    # Both sides of a match in one process over a simulated network, stepping
+    # a shared clock one frame at a time, until neither has a guessed input
+    # left. Returns both sessions.
+    now = [0.0]
+    transports = LoopbackTransport.pair(latency, jitter, loss, seed, clock=lambda: now[0])
+    sessions = []
+    for side, transport in enumerate(transports):
+        level = new_level(player, opponent)
+        level.round_time = level.current_time = round_time
+        sessions.append(RollbackSession(level, transport, local=side))
+    rngs = [random.Random(seed * 2), random.Random(seed * 2 + 1)]
+    policies = [policy_a, policy_b]
+
+    def done(session):
+        return session.frame >= frames or session.level.is_over()
+
+    while not all(done(s) and s.settled() for s in sessions):
+        for session, policy, rng in zip(sessions, policies, rngs):
+            level = session.level
+            if done(session):
+                session.hold()
+            else:
+                me = session.me()
+                session.advance(policy(level, me, level.opponent if me is level.player else level.player, rng))
+        now[0] += 1.0 / SIM_HZ
+    return sessions
+
+
+def replay_history(history, player, opponent, round_time=60) -> Level:
+    # A plain local run of confirmed inputs, no network: what a session's
+    # level must match
+    level = new_level(player, opponent)
+    level.round_time = level.current_time = round_time
+    for packed in history:
+        level.step(packed & 0x0F, packed >> 4, 1.0 / SIM_HZ)
+    return level
+
+
+def bench_resim(frames=MAX_ROLLBACK, repeat=200):
+    # Worst case: roll back the full window every frame
+    level = new_level("cpu", "shadow-viper")
+    transport = LoopbackTransport()
+    transport.peer = LoopbackTransport()
+    session = RollbackSession(level, transport, max_rollback=frames + 1)
+    for _ in range(frames):
+        session.advance(0)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        session.rollback(session.frame - frames)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2], timings[-1]
+
+
+def play(local: int, port: int, peer_port: int, peer_host: str, player: str, opponent: str, input_delay: int):
+    # A real fight in a window against another instance, e.g.
+    #   python rollback.py play --local 0 --port 7470 --peer-port 7471
+    #   python rollback.py play --local 1 --port 7471 --peer-port 7470
+    os.environ.pop("SDL_VIDEODRIVER", None)
+    os.environ.pop("SDL_AUDIODRIVER", None)
+    transport = UdpTransport(port, peer_port, peer_host=peer_host)
+    session = RollbackSession(new_level(player, opponent), transport, local, input_delay)
+    try:
+        session.level.run(session=session)
+    finally:
+        session.flush()
+        transport.close()
+    print(session.stats())
+
+
+def main(argv=None):
+    from headless import POLICIES
+    parser = argparse.ArgumentParser(description="Rollback netcode: simulated matches, resim benchmark, online play")
+    parser.add_argument("mode", choices=("simulate", "bench", "play"))
+    parser.add_argument("--player", default="cpu", help="catalog id or name")
+    parser.add_argument("--opponent", default="shadow-viper", help="catalog id or name")
+    parser.add_argument("--policy-a", choices=POLICIES, default="random")
+    parser.add_argument("--policy-b", choices=POLICIES, default="defensive")
+    parser.add_argument("--frames", type=int, default=1800)
+    parser.add_argument("--latency", type=float, default=80, help="one-way, ms")
+    parser.add_argument("--jitter", type=float, default=20, help="ms")
+    parser.add_argument("--loss", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--local", type=int, choices=(0, 1), default=0)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--peer-port", type=int, default=DEFAULT_PORT + 1)
+    parser.add_argument("--peer-host", default="127.0.0.1")
+    parser.add_argument("--input-delay", type=int, default=INPUT_DELAY)
+    args = parser.parse_args(argv)
+
+    if args.mode == "bench":
+        for frames in (MAX_ROLLBACK, 2 * MAX_ROLLBACK):
+            p50, worst = bench_resim(frames)
+            print(f"resim {frames:>2} frames: median {p50:.3f}ms max {worst:.3f}ms (budget {1000 / SIM_HZ:.1f}ms)")
+        return 0
+    if args.mode == "play":
+        play(args.local, args.port, args.peer_port, args.peer_host, args.player, args.opponent, args.input_delay)
+        return 0
+
+    start = time.perf_counter()
+    sessions = simulate_netplay(args.player, args.opponent, POLICIES[args.policy_a],
+                                POLICIES[args.policy_b], args.frames, args.latency / 1000,
+                                args.jitter / 1000, args.loss, args.seed)
+    elapsed = time.perf_counter() - start
+    for side, session in enumerate(sessions):
+        print(f"side {side}: {session.stats()}")
+    # Each side matches a local replay of what it confirmed, and both
+    # confirmed the same inputs (one may have run a few idle frames further
+    # after the round ended)
+    a, b = (session.history for session in sessions)
+    synced = a[:len(b)] == b[:len(a)] and all(
+        replay_history(s.history, args.player, args.opponent).snapshot() == s.level.snapshot() for s in sessions)
+    winner = sessions[0].level.winner()
+    print(f"{'in sync' if synced else 'DESYNC'}: {winner.name if winner else 'draw'} after "
+          f"{len(a)} frames ({elapsed:.2f}s)")
+    return 0 if synced else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import os
+from collections import OrderedDict
+from typing import Callable, Dict
+
+import display
+import game_state
+
+# Resident scenes may hold this many bytes of surfaces between them before
+# the least recently used ones are unloaded
+SCENE_MEMORY_BUDGET = int(os.environ.get("UB_SCENE_BUDGET", 64 * 1024 * 1024))
+
+
+class Scene:
+    # A game state that stays resident between visits. load() builds what the
+    # scene needs once, enter() runs on every visit and run() owns the loop
+    # until it returns the next game_state. Leaving calls suspend() and
+    # keeps everything in memory, so coming back is instant; exit() and
+    # unload() only run when the manager evicts the scene or the game ends.
+    size = (800, 600)
+    caption = "UNTITLED BOXING"
+
+    def __init__(self):
+        self.loaded = False
+
+    def load(self):
+        pass
+
+    def unload(self):
+        pass
+
+    def enter(self, previous: str = None):
+        pass
+
+    def suspend(self):
+        pass
+
+    def exit(self):
+        pass
+
+    def run(self) -> str:
+        return game_state.EXIT
+
+    def resident_bytes(self) -> int:
+        return 0
+
+
+class SceneManager:
+    def __init__(self, budget: int = SCENE_MEMORY_BUDGET):
+        self.budget = budget
+        self.factories: Dict[str, Callable[[], Scene]] = {}
+        self.scenes: "OrderedDict[str, Scene]" = OrderedDict()
+        self.state = None
+
+    def register(self, state: str, factory: Callable[[], Scene]):
+        self.factories[state] = factory
+
+    def get(self, state: str) -> Scene:
+        scene = self.scenes.get(state)
+        if scene is None:
+            scene = self.scenes[state] = self.factories[state]()
+        if not scene.loaded:
+            scene.load()
+            scene.loaded = True
+        self.scenes.move_to_end(state)
+        return scene
+
+    def current(self) -> Scene:
+        return self.scenes.get(self.state) if self.state else None
+
+    def switch(self, state: str) -> Scene:
+        previous = self.state
+        if previous is not None:
+            self.scenes[previous].suspend()
+        self.state = state
+        scene = self.get(state)
+        display.use(scene.size, scene.caption)
+        scene.enter(previous)
+        self.evict()
+        return scene
+
+    def resident_bytes(self) -> int:
+        return sum(scene.resident_bytes() for scene in self.scenes.values() if scene.loaded)
+
+    def unload(self, state: str):
+        scene = self.scenes[state]
+        if scene.loaded:
+            scene.exit()
+            scene.unload()
+            scene.loaded = False
+
+    def evict(self):
+        # Least recently used first, never the scene being shown
+        for state in list(self.scenes):
+            if self.resident_bytes() <= self.budget:
+                break
+            if state != self.state:
+                self.unload(state)
+
+    def shutdown(self):
+        for state in list(self.scenes):
+            self.unload(state)
+        self.state = None
+
+    def run(self, state: str):
+        self.switch(state)
+        while True:
+            next_state = self.current().run()
+            if next_state == game_state.EXIT:
+                self.shutdown()
+                return
+            self.switch(next_state)
@@ -0,0 +1,148 @@
+import time
+import threading
+import pygame
+from typing import Dict
+
+import display
+from preloader import preloader, load_sound
+
+# Channel layout: a fixed set of reserved channels per effect group. A group
+# only ever plays on its own channels, so a burst of menu hovers can't take
+# the channel a punch needs, and anything left over stays free for plain
+# Sound.play(). Music streams through mixer.music and needs no channel.
+CHANNEL_GROUPS = {"ui": 2, "fx": 6}
+TOTAL_CHANNELS = 16
+MUSIC_FADE_MS = 800
+MUSIC_VOLUME = 0.5
+
+
+class SoundEntry:
+    __slots__ = ("name", "path", "group", "volume", "min_interval", "last_played")
+
+    def __init__(self, name, path, group, volume, min_interval):
+        self.name = name
+        self.path = path
+        self.group = group
+        self.volume = volume
+        self.min_interval = min_interval
+        self.last_played = 0.0
+
+
+class SoundBank:
+    # Effects decoded on the preloader's worker threads into mixer.Sound
+    # buffers. play() never blocks: a sound that hasn't finished decoding (or
+    # failed to) is simply skipped. Music is streamed by mixer.music rather
+    # than decoded whole, so a track costs a small buffer instead of minutes
+    # of PCM. It has a single stream, so a new track fades in once the old
+    # one has faded out rather than over it.
+    def __init__(self, groups: Dict[str, int] = CHANNEL_GROUPS):
+        self.entries: Dict[str, SoundEntry] = {}
+        self.group_sizes = groups
+        self.started = None  # None until start(), then whether audio is usable
+        self.groups = {}
+        self.music_path = None  # the track actually playing
+        self.music_next = None  # the track asked for, which may still be waiting on a fade-out
+        self.music_volume = MUSIC_VOLUME
+        self.missing_music = set()
+        self.lock = threading.Lock()
+
+    def register(self, name: str, path: str, group: str = "fx", volume: float = 1.0, min_interval: float = 0.0):
+        self.entries[name] = SoundEntry(name, path, group, volume, min_interval)
+
+    def start(self) -> bool:
+        # Opens the audio device on first use and carves up the channels
+        if self.started is None:
+            self.started = not display.headless and display.init_audio()
+            if self.started:
+                pygame.mixer.set_num_channels(max(TOTAL_CHANNELS, sum(self.group_sizes.values())))
+                pygame.mixer.set_reserved(sum(self.group_sizes.values()))
+                index = 0
+                for group, size in self.group_sizes.items():
+                    # [channel, time it last started] per slot
+                    self.groups[group] = [[pygame.mixer.Channel(i), 0.0] for i in range(index, index + size)]
+                    index += size
+        return self.started
+
+    def preload(self, *names):
+        if not self.start():
+            return
+        for name in names or self.entries:
+            self.handle(self.entries[name].path)
+
+    @staticmethod
+    def handle(path: str):
+        return preloader.submit("sound:" + path, load_sound, path)
+
+    def sound(self, path: str):
+        handle = self.handle(path)
+        return handle.result() if handle.ready() else None
+
+    def play(self, name: str):
+        if not self.start():
+            return None
+        entry = self.entries[name]
+        sound = self.sound(entry.path)
+        if sound is None:
+            return None
+        now = time.perf_counter()
+        if now - entry.last_played < entry.min_interval:
+            return None
+        entry.last_played = now
+        slot = self.free_slot(entry.group)
+        slot[1] = now
+        slot[0].set_volume(entry.volume)
+        slot[0].play(sound)
+        return slot[0]
+
+    def free_slot(self, group: str):
+        slots = self.groups[group]
+        for slot in slots:
+            if not slot[0].get_busy():
+                return slot
+        # Everything in the group is busy: restart its oldest sound rather
+        # than reaching into another group's channels
+        return min(slots, key=lambda slot: slot[1])
+
+    def play_music(self, path: str, fade_ms: int = MUSIC_FADE_MS, volume: float = None):
+        # Returns straight away. Keeps playing if the track is already on, so
+        # re-entering a scene doesn't restart its music.
+        if path in self.missing_music or not self.start():
+            return
+        with self.lock:
+            if path == self.music_next:
+                return
+            self.music_next = path
+        if volume is not None:
+            self.music_volume = volume
+        if pygame.mixer.music.get_busy() and fade_ms > 0:
+            pygame.mixer.music.fadeout(fade_ms)
+            timer = threading.Timer(fade_ms / 1000, self.switch_music, (path, fade_ms))
+            timer.daemon = True
+            timer.start()
+        else:
+            self.switch_music(path, fade_ms)
+
+    def switch_music(self, path: str, fade_ms: int):
+        # May run on a timer thread; SDL_mixer locks the audio device itself.
+        # Opening a track only reads its header, the stream decodes as it plays.
+        with self.lock:
+            if path != self.music_next:
+                return
+            try:
+                pygame.mixer.music.load(path)
+                pygame.mixer.music.set_volume(self.music_volume)
+                pygame.mixer.music.play(-1, fade_ms=fade_ms)
+                self.music_path = path
+            except pygame.error:
+                print(f"Music file could not be loaded: {path}")
+                self.missing_music.add(path)
+                self.music_path = self.music_next = None
+
+    def stop_music(self, fade_ms: int = MUSIC_FADE_MS):
+        with self.lock:
+            self.music_path = self.music_next = None
+        if self.started:
+            pygame.mixer.music.fadeout(fade_ms)
+
+
+sound_bank = SoundBank()
@@ -0,0 +1,45 @@
+import os
+import sys
+import time
+
+# Imported first thing by main.py so the clock starts before pygame and the
+# rest of the game are imported. UB_STARTUP_REPORT=1 prints the phases once
+# the first frame is on screen; UB_STARTUP_REPORT=json prints them as one
+# JSON line and exits (used by bench.py).
+START = time.perf_counter()
+REPORT = os.environ.get("UB_STARTUP_REPORT", "")
+
+marks = []
+done = False
+
+
+def mark(name: str):
+    if not done:
+        marks.append((name, time.perf_counter()))
+
+
+def phases() -> dict:
+    result = {}
+    last = START
+    for name, at in marks:
+        result[name] = (at - last) * 1000
+        last = at
+    result["time_to_first_frame"] = (last - START) * 1000
+    return result
+
+
+def first_frame():
+    # Called once the menu is on screen; later calls do nothing
+    global done
+    if done:
+        return
+    mark("first_frame")
+    done = True
+    if REPORT == "json":
+        import json
+        print(json.dumps(phases()))
+        sys.exit(0)
+    if REPORT:
+        for name, ms in phases().items():
+            print(f"startup {name:<20} {ms:8.1f} ms")
+        sys.stdout.flush()
@@ -0,0 +1,98 @@
+import pygame
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Tuple
+
+import display
+
+TEXT_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=None)
+def get_sysfont(name: str, size: int) -> pygame.font.Font:
+    # SysFont scans the installed fonts on every call; do it once per font
+    return pygame.font.SysFont(name, size)
+
+
+class GlyphAtlas:
+    # One pre-rendered surface per character for strings that change every
+    # frame (timers, counters). Drawing blits glyphs side by side, so a new
+    # value costs no font rendering and no allocation.
+    def __init__(self, font: pygame.font.Font, color, antialias: bool = True, chars: str = "0123456789"):
+        self.font = font
+        self.color = color
+        self.antialias = antialias
+        self.glyphs = {}
+        for ch in chars:
+            self.glyph(ch)
+
+    def glyph(self, ch: str) -> pygame.Surface:
+        surf = self.glyphs.get(ch)
+        if surf is None:
+            surf = self.glyphs[ch] = display.convert(self.font.render(ch, self.antialias, self.color))
+        return surf
+
+    def size(self, text: str) -> Tuple[int, int]:
+        return sum(self.glyph(ch).get_width() for ch in text), self.font.get_height()
+
+    def get_rect(self, text: str, **kwargs) -> pygame.Rect:
+        rect = pygame.Rect((0, 0), self.size(text))
+        for name, value in kwargs.items():
+            setattr(rect, name, value)
+        return rect
+
+    def blit(self, surface: pygame.Surface, text: str, dest) -> pygame.Rect:
+        rect = pygame.Rect(dest, self.size(text)) if len(dest) == 2 else pygame.Rect(dest)
+        x = rect.x
+        for ch in text:
+            glyph = self.glyph(ch)
+            surface.blit(glyph, (x, rect.y))
+            x += glyph.get_width()
+        return rect
+
+
+class TextCache:
+    # LRU of rendered text surfaces keyed by (font, text, color, antialias).
+    # Static labels are rendered once and then only blitted.
+    def __init__(self, capacity: int = TEXT_CACHE_SIZE):
+        self.capacity = capacity
+        self.entries: OrderedDict = OrderedDict()
+        self.atlases = {}
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font: pygame.font.Font, text: str, color, antialias: bool = True) -> pygame.Surface:
+        key = (font, text, tuple(color), antialias)
+        surf = self.entries.get(key)
+        if surf is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        surf = self.entries[key] = display.convert(font.render(text, antialias, color))
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return surf
+
+    def atlas(self, font: pygame.font.Font, color, antialias: bool = True, chars: str = "0123456789") -> GlyphAtlas:
+        key = (font, tuple(color), antialias)
+        atlas = self.atlases.get(key)
+        if atlas is None:
+            atlas = self.atlases[key] = GlyphAtlas(font, color, antialias, chars)
+        return atlas
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries),
+                "hit_rate": self.hits / total if total else 0.0}
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.entries.clear()
+        self.atlases.clear()
+
+
+text_cache = TextCache()
@@ -0,0 +1,60 @@
+import time
+
+
+class FixedTimestep:
+    # Accumulator loop: real elapsed time is banked and paid out in fixed
+    # simulation steps, so fight logic advances the same way no matter how
+    # fast frames are drawn. `alpha` is how far we are into the next step,
+    # for interpolating what gets drawn. Rendering can be capped below the
+    # simulation rate with render_hz.
+    def __init__(self, sim_hz: int = 60, render_hz: int = None, max_steps: int = 8):
+        self.sim_hz = sim_hz
+        self.dt = 1.0 / sim_hz
+        self.render_interval = 1.0 / render_hz if render_hz else 0.0
+        # Cap on catch-up steps per call, so a long stall (window drag,
+        # breakpoint) doesn't freeze us in a spiral of simulation
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.since_render = self.render_interval
+        self.last = None
+        self.ticks = 0
+
+    def set_render_hz(self, render_hz: int = None):
+        self.render_interval = 1.0 / render_hz if render_hz else 0.0
+        self.since_render = min(self.since_render, self.render_interval)
+
+    def reset(self):
+        self.accumulator = 0.0
+        self.since_render = self.render_interval
+        self.last = None
+
+    def advance(self, elapsed: float = None) -> int:
+        # Returns how many fixed steps to simulate now
+        now = time.perf_counter()
+        if elapsed is None:
+            elapsed = 0.0 if self.last is None else now - self.last
+        self.last = now
+        self.accumulator += elapsed
+        self.since_render += elapsed
+        steps = int(self.accumulator / self.dt)
+        if steps > self.max_steps:
+            steps = self.max_steps
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= steps * self.dt
+        self.ticks += steps
+        return steps
+
+    @property
+    def alpha(self) -> float:
+        return self.accumulator / self.dt
+
+    def should_render(self) -> bool:
+        # Half a step of slack so millisecond jitter in clock.tick doesn't
+        # skip frames when both rates are the same
+        if self.since_render + self.dt * 0.5 < self.render_interval:
+            return False
+        self.since_render -= self.render_interval
+        if not 0.0 <= self.since_render < self.render_interval:
+            self.since_render = 0.0
+        return True
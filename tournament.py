@@ -0,0 +1,154 @@
+import os
+import sys
+import csv
+import json
+import time
+import random
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from headless import simulate_match, find_character, roster, POLICIES
+
+# A match is (player, opponent, policy_a, policy_b, seed, round_time) using
+# catalog ids only, so jobs pickle cheaply and workers look everything up locally
+
+
+def round_robin(repeats, policies, seed=0, round_time=60):
+    names = [char.id for char in roster()]
+    matches = []
+    for player, opponent in itertools.permutations(names, 2):
+        for policy_a, policy_b in itertools.product(policies, repeat=2):
+            for i in range(repeats):
+                matches.append((player, opponent, policy_a, policy_b, seed + len(matches), round_time))
+    return matches
+
+
+def monte_carlo(count, policies, seed=0, round_time=60):
+    names = [char.id for char in roster()]
+    rng = random.Random(seed)
+    matches = []
+    for i in range(count):
+        player, opponent = rng.sample(names, 2)
+        matches.append((player, opponent, rng.choice(policies), rng.choice(policies), seed + i, round_time))
+    return matches
+
+
+def run_chunk(chunk):
+    results = []
+    for player, opponent, policy_a, policy_b, seed, round_time in chunk:
+        result = simulate_match(find_character(player), find_character(opponent),
+                                POLICIES[policy_a], POLICIES[policy_b], seed=seed, round_time=round_time)
+        result["policy_a"] = policy_a
+        result["policy_b"] = policy_b
+        results.append(result)
+    return results
+
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class ResultWriter:
+    # Streams rows to .csv or .jsonl as chunks complete and keeps a running
+    # win/loss/draw table, so nothing holds the full result set in memory
+    FIELDS = ["player", "opponent", "policy_a", "policy_b", "seed", "winner", "ticks",
+              "player_health", "opponent_health", "time_left"]
+
+    def __init__(self, path=None):
+        self.path = path
+        self.file = open(path, "w", newline="") if path else None
+        self.csv = None
+        if self.file and not path.endswith(".jsonl"):
+            self.csv = csv.DictWriter(self.file, fieldnames=self.FIELDS)
+            self.csv.writeheader()
+        self.table = {}
+        self.count = 0
+
+    def add(self, results):
+        for result in results:
+            if self.csv:
+                self.csv.writerow(result)
+            elif self.file:
+                self.file.write(json.dumps(result) + "\n")
+            for name in (result["player"], result["opponent"]):
+                row = self.table.setdefault(name, {"wins": 0, "losses": 0, "draws": 0})
+                if result["winner"] is None:
+                    row["draws"] += 1
+                elif result["winner"] == name:
+                    row["wins"] += 1
+                else:
+                    row["losses"] += 1
+            self.count += 1
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+    def summary(self):
+        lines = []
+        for name, row in sorted(self.table.items(), key=lambda item: -item[1]["wins"]):
+            played = row["wins"] + row["losses"] + row["draws"]
+            lines.append(f"{name:<28} W{row['wins']:>6} L{row['losses']:>6} D{row['draws']:>6} "
+                         f"win rate {row['wins'] / played:.1%}")
+        return "\n".join(lines)
+
+
+def run(matches, workers, chunk_size, writer):
+    start = time.perf_counter()
+    if workers <= 1:
+        for chunk in chunked(matches, chunk_size):
+            writer.add(run_chunk(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_chunk, chunk) for chunk in chunked(matches, chunk_size)]
+            for future in as_completed(futures):
+                writer.add(future.result())
+    return time.perf_counter() - start
+
+
+def scale_test(matches, max_workers, chunk_size):
+    for workers in range(1, max_workers + 1):
+        elapsed = run(matches, workers, chunk_size, ResultWriter())
+        print(f"workers={workers:<3} {len(matches)} matches in {elapsed:.2f}s "
+              f"({len(matches) / elapsed:.0f} matches/s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run headless tournaments across a process pool")
+    parser.add_argument("mode", choices=["round-robin", "monte-carlo", "scale"])
+    parser.add_argument("--matches", type=int, default=1000, help="matches for monte-carlo and scale")
+    parser.add_argument("--repeats", type=int, default=10, help="repeats per pairing for round-robin")
+    parser.add_argument("--policies", default=",".join(POLICIES))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--round-time", type=float, default=60)
+    parser.add_argument("--out", help="results file (.csv or .jsonl)")
+    args = parser.parse_args(argv)
+
+    policies = args.policies.split(",")
+    for name in policies:
+        if name not in POLICIES:
+            parser.error(f"unknown policy: {name}")
+
+    if args.mode == "scale":
+        scale_test(monte_carlo(args.matches, policies, args.seed, args.round_time), args.workers, args.chunk_size)
+        return
+
+    if args.mode == "round-robin":
+        matches = round_robin(args.repeats, policies, args.seed, args.round_time)
+    else:
+        matches = monte_carlo(args.matches, policies, args.seed, args.round_time)
+    writer = ResultWriter(args.out)
+    try:
+        elapsed = run(matches, args.workers, args.chunk_size, writer)
+    finally:
+        writer.close()
+    print(writer.summary())
+    print(f"{writer.count} matches in {elapsed:.2f}s ({writer.count / elapsed:.0f} matches/s, {args.workers} workers)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())